@@ -1,11 +1,30 @@
+import fcntl
+import hashlib
+import json
 import logging
-import re
 import pdfplumber
-from pdf2image import convert_from_bytes
-import pytesseract
-import pandas as pd
-from PIL import ImageEnhance, ImageFilter
 import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from cas_numbers import has_valid_check_digit, normalize_cas_rn, split_cas_rns
+from chemsure_metrics import (
+    GADSL_ENTRIES, GADSL_LOAD_SECONDS, LOOKUPS, MSDS_DOCUMENTS, PDF_BYTES, record_stage, time_stage
+)
+from gadsl_filter_index import GadslFilterIndex, iter_bits
+from gadsl_snapshot import SnapshotError, compute_file_sha256, open_snapshot, read_snapshot_source, write_snapshot
+from msds_ocr import count_pdf_pages, iter_page_texts
+from msds_tokenizer import SECTION_3_HEADER, SECTION_4_HEADER, find_section_3, tokenize_msds_text
+from msds_result_cache import MsdsResultCache, make_msds_cache_key
+from msds_screening_index import (
+    CAS_KEY_PREFIX, NAME_KEY_PREFIX, MsdsScreeningIndex, diff_matches, fingerprint_entries
+)
+from substance_scanner import COMMON_WORDS_TO_EXCLUDE, SubstanceNameScanner, normalize_substance_name, substance_name_variants
+from substance_search import SubstanceSearchIndex
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -22,241 +41,993 @@ logger = logging.getLogger(__name__)
 GADSL_FILE_NAME = "GADSL-Reference-List.xlsx"
 GADSL_FILE_PATH = os.path.join(os.path.dirname(__file__), GADSL_FILE_NAME)
 
-# Internal global variables to store GADSL data for efficient lookups
-_gadsl_data_by_cas = None
-_gadsl_data_by_name = None
+# Binary snapshot of the Excel file, rebuilt automatically whenever the Excel file changes.
+# Build it ahead of deployment with `python gadsl_snapshot.py` so workers never touch pandas.
+GADSL_SNAPSHOT_PATH = os.environ.get(
+    "GADSL_SNAPSHOT_PATH", os.path.splitext(GADSL_FILE_PATH)[0] + ".snapshot"
+)
+
+# Column names of every GADSL entry, in snapshot order
+GADSL_FIELDS = [
+    "gadsl_hash", "ref_hash", "substance_name", "cas_rn",
+    "classification", "reason_code", "source",
+    "generic_examples", "reporting_threshold", "first_added", "last_revised"
+]
+
+# Pages with less extractable text than this are treated as scanned and OCR'd
+OCR_MIN_PAGE_TEXT_CHARS = 50
+# Stop reading further pages once the SECTION 3 -> SECTION 4 boundary has been seen
+STOP_AT_SECTION_4 = os.environ.get("CHEMSURE_STOP_AT_SECTION_4", "0") == "1"
+
+# Cache of MSDS results keyed on document content + GADSL list version; set the directory to "" to keep it in memory only
+MSDS_CACHE_DIR = os.environ.get("CHEMSURE_MSDS_CACHE_DIR", os.path.join(os.path.dirname(__file__), ".msds_cache"))
+MSDS_CACHE_MAX_BYTES = int(os.environ.get("CHEMSURE_MSDS_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+MSDS_CACHE_MEMORY_ENTRIES = int(os.environ.get("CHEMSURE_MSDS_CACHE_MEMORY_ENTRIES", 128))
+
+# Index of screened documents, re-screened incrementally when a new GADSL revision is loaded; "" disables it
+SCREENING_INDEX_PATH = os.environ.get(
+    "CHEMSURE_SCREENING_INDEX", os.path.join(os.path.dirname(__file__), ".msds_index", "screening.sqlite3")
+)
+# Documents kept in it (the most recently screened ones); 0 keeps every document
+SCREENING_INDEX_MAX_DOCUMENTS = int(os.environ.get("CHEMSURE_SCREENING_INDEX_MAX_DOCUMENTS", 50000))
+
+# Latency budget and result limits of substance name suggestions (typeahead / fuzzy search)
+SEARCH_TIME_BUDGET_MS = float(os.environ.get("CHEMSURE_SEARCH_BUDGET_MS", 25))
+SEARCH_MAX_LIMIT = 50
+SEARCH_MIN_FUZZY_SCORE = 0.3 # Dice similarity below which fuzzy matches are not worth suggesting
+
+# Page size of filter queries over the list; a limit of 0 exports every match in one response
+QUERY_DEFAULT_LIMIT = 100
+QUERY_MAX_LIMIT = 1000
+
+# Bump when the matching rules change, so results cached under the old rules are not served
+MSDS_MATCHING_REVISION = 3
+
+# Reloading: every worker polls the snapshot for a new version every N seconds; with
+# CHEMSURE_WATCH_GADSL_FILE=1 a change of the Excel file also rebuilds the snapshot
+WATCH_GADSL_FILE = os.environ.get("CHEMSURE_WATCH_GADSL_FILE", "0") == "1"
+WATCH_INTERVAL_SECONDS = float(os.environ.get("CHEMSURE_WATCH_INTERVAL_SECONDS", 5))
+
+class GadslDataset:
+    """One fully built version of the GADSL list with all of its lookup structures.
+
+    A dataset is never modified after construction. Reloading builds a new one and swaps the
+    single global reference, so a request that holds a dataset sees one consistent list version.
+    """
+
+    def __init__(self, snapshot, by_cas, by_name, version, name_scanner, search_index, filter_index):
+        self.snapshot = snapshot # Memory-mapped rows (see gadsl_snapshot.py)
+        self.by_cas = by_cas # Read-only mappings over the snapshot; a CAS RN maps to every row listing it
+        self.by_name = by_name
+        self.version = version # SHA-256 of the Excel file the data came from
+        self.name_scanner = name_scanner # Aho-Corasick automaton over every substance name and synonym
+        self.search_index = search_index # Trigram + prefix index for typo-tolerant name search
+        self.filter_index = filter_index # Bitmaps over classification, reason code, source and dates
+        # Every entry's JSON, serialized when the snapshot was written: lookups answer by joining its bytes
+        self.entry_json = snapshot.array("entry_json")
+        self.loaded_at = time.time()
+
+# Internal global variable holding the active GADSL dataset; replaced as a whole, never mutated
+_gadsl_dataset = None
+_reload_lock = threading.Lock() # Only one reload builds at a time
+_reload_status = {"state": "idle", "started_at": None, "finished_at": None, "error": None}
+_msds_result_cache = MsdsResultCache(
+    max_memory_entries=MSDS_CACHE_MEMORY_ENTRIES, disk_dir=MSDS_CACHE_DIR or None, max_disk_bytes=MSDS_CACHE_MAX_BYTES
+)
+_screening_index = None # Opened on first use, see get_screening_index()
+_screening_index_lock = threading.Lock()
+_screening_index_failed = False
+_recorded_versions = set() # List versions whose key fingerprints this process has stored
+
+def _read_gadsl_rows_from_excel(file_path):
+    """Parse the GADSL Excel file into a list of entry dicts (slow path, needs pandas)."""
+    import pandas as pd # Imported lazily: workers served from the snapshot never load pandas
+
+    df = pd.read_excel(file_path)
+
+    # --- MODIFICATION: EXCLUDING 'Effective date' COLUMN ---
+    df.rename(columns={
+        'GADSL #': "gadsl_hash",
+        'REF #': "ref_hash",
+        'Substance': "substance_name",
+        'CAS RN': "cas_rn",
+        'Classification': "classification",
+        'Reason Code': "reason_code",
+        'Source\n(Legal requirements, regulations)': "source",
+        # 'Effective date (Legal requirements, regulations)\n Date           |        Action required' is EXCLUDED
+        'Generic examples': "generic_examples",
+        'Reporting threshold\n(0.1% unless otherwise stated)': "reporting_threshold",
+        'First added': "first_added",
+        'Last revised': "last_revised"
+    }, inplace=True)
+    # --- END MODIFICATION ---
+
+    # Check if the DataFrame is empty or if any required columns are missing after renaming
+    if df.empty or not all(col in df.columns for col in GADSL_FIELDS):
+        missing_cols = [col for col in GADSL_FIELDS if col not in df.columns]
+        raise ValueError(f"GADSL file is empty or missing one or more required columns after renaming. Missing: {missing_cols}")
+
+    rows = []
+    # to_dict("records") avoids building a pandas Series per row like df.iterrows() does
+    for row in df[GADSL_FIELDS].to_dict("records"):
+        entry_data = {}
+        for field in GADSL_FIELDS:
+            value = row[field]
+            if pd.isna(value):
+                value = "0.1%" if field == "reporting_threshold" else "N/A" # Default threshold is 0.1%
+            else:
+                value = str(value).strip()
+                if not value and field in ("cas_rn", "substance_name"):
+                    value = "N/A" # Keep original case for display, but never an empty key
+            entry_data[field] = value
+        rows.append(entry_data)
+    return rows
+
+def _gadsl_snapshot_indexes(rows):
+    """Lookup keys -> row ids: normalized CAS RN -> every row listing it, lowercased name -> last row with it."""
+    by_cas = {}
+    by_name = {}
+    for row_id, entry_data in enumerate(rows):
+        cas_rn = entry_data["cas_rn"]
+        substance_name = entry_data["substance_name"]
+        if cas_rn != "N/A":
+            # A cell can list several CAS RNs; identifiers that aren't CAS RNs (EC numbers) are kept as written
+            for key in split_cas_rns(cas_rn) or [cas_rn]:
+                by_cas.setdefault(key, []).append(row_id)
+        if substance_name != "N/A":
+            # Ensure substance names are stored in lowercase for robust matching
+            by_name[substance_name.lower()] = row_id
+    return {"cas_rn": by_cas, "substance_name": by_name}
+
+def _gadsl_snapshot_arrays(rows, indexes):
+    """Entry JSON and the tables of the name scanner and search index, built once here and shared by every worker via the snapshot."""
+    display_names = {key: rows[row_id]["substance_name"] for key, row_id in sorted(indexes["substance_name"].items())}
+    arrays = {"entry_json": [json.dumps(entry_data) for entry_data in rows]}
+    for prefix, structure in (("name_scanner", SubstanceNameScanner(display_names)),
+                              ("substance_search", SubstanceSearchIndex(display_names))):
+        arrays.update((f"{prefix}.{name}", table) for name, table in structure.tables().items())
+    return arrays
+
+def _write_gadsl_snapshot(rows, source_sha256, snapshot_path):
+    indexes = _gadsl_snapshot_indexes(rows)
+    write_snapshot(rows, GADSL_FIELDS, source_sha256, snapshot_path, indexes=indexes,
+                   arrays=_gadsl_snapshot_arrays(rows, indexes))
+
+def build_gadsl_snapshot(source_path=GADSL_FILE_PATH, snapshot_path=GADSL_SNAPSHOT_PATH):
+    """Build step: convert the Excel file into a binary snapshot keyed on the Excel file's hash."""
+    source_sha256 = compute_file_sha256(source_path)
+    rows = _read_gadsl_rows_from_excel(source_path)
+    _write_gadsl_snapshot(rows, source_sha256, snapshot_path)
+    return rows, source_sha256
+
+def _open_current_gadsl_snapshot(snapshot_path, source_sha256):
+    """Map the snapshot, rejecting one written by an older build that lacks the shared arrays."""
+    snapshot = open_snapshot(snapshot_path, GADSL_FIELDS, source_sha256)
+    snapshot.array("entry_json") # Raises SnapshotError, so the caller rebuilds it
+    return snapshot
+
+@contextmanager
+def _gadsl_snapshot_build_lock(snapshot_path):
+    """Exclusive lock of every process on the host that builds `snapshot_path`; blocks until it is free."""
+    with open(f"{snapshot_path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX) # Released when the file is closed, even if the process dies
+        yield
+
+def ensure_gadsl_snapshot(source_path=GADSL_FILE_PATH, snapshot_path=GADSL_SNAPSHOT_PATH):
+    """Rebuild the snapshot if it is missing or stale; run once in the server master before forking workers."""
+    with _gadsl_snapshot_build_lock(snapshot_path):
+        try:
+            _open_current_gadsl_snapshot(snapshot_path, compute_file_sha256(source_path))
+            return False
+        except SnapshotError as e:
+            logger.info(f"GADSL snapshot not usable ({e}), building it from the Excel file.")
+        build_gadsl_snapshot(source_path, snapshot_path)
+        return True
+
+def _open_gadsl_snapshot(source_path, snapshot_path):
+    """Returns (mapped snapshot, source_sha256), building the snapshot from Excel first when it is stale."""
+    source_sha256 = compute_file_sha256(source_path)
+    try:
+        snapshot = _open_current_gadsl_snapshot(snapshot_path, source_sha256)
+        logger.info(f"Loaded GADSL data from snapshot: {snapshot_path}")
+        return snapshot, source_sha256
+    except SnapshotError as e:
+        logger.info(f"GADSL snapshot not usable ({e}), falling back to the Excel file.")
+
+    rows = None
+    try:
+        # Workers started together (without a master building it first) parse the Excel file once between them
+        with _gadsl_snapshot_build_lock(snapshot_path):
+            try:
+                snapshot = _open_current_gadsl_snapshot(snapshot_path, source_sha256)
+                logger.info(f"Loaded GADSL data from snapshot built by another process: {snapshot_path}")
+                return snapshot, source_sha256
+            except SnapshotError:
+                pass
+            rows = _read_gadsl_rows_from_excel(source_path)
+            _write_gadsl_snapshot(rows, source_sha256, snapshot_path)
+    except OSError as e:
+        # A read-only deployment still works from a private snapshot, it just isn't shared between workers
+        logger.warning(f"Could not write GADSL snapshot to {snapshot_path}: {e}")
+        if rows is None:
+            rows = _read_gadsl_rows_from_excel(source_path)
+        fd, snapshot_path = tempfile.mkstemp(suffix=".snapshot")
+        os.close(fd)
+        _write_gadsl_snapshot(rows, source_sha256, snapshot_path)
+        try:
+            return open_snapshot(snapshot_path, GADSL_FIELDS, source_sha256), source_sha256
+        finally:
+            os.remove(snapshot_path) # The mapping stays valid after the file is unlinked
+    return open_snapshot(snapshot_path, GADSL_FIELDS, source_sha256), source_sha256
+
+def _build_gadsl_dataset(source_path, snapshot_path):
+    """Map the GADSL snapshot and build every lookup structure; touches no global state."""
+    snapshot, source_sha256 = _open_gadsl_snapshot(source_path, snapshot_path)
+    return _gadsl_dataset_from_snapshot(snapshot, source_sha256)
+
+def _gadsl_dataset_from_snapshot(snapshot, source_sha256):
+    """Wrap an already mapped snapshot into a dataset, without touching the Excel file."""
+    # Read-only mappings over the snapshot (key -> row dict, decoded on access), shared by all workers
+    gadsl_by_cas = snapshot.index("cas_rn")
+    gadsl_by_name = snapshot.index("substance_name")
+
+    # The name automaton and search index were built with the snapshot; these only wrap its arrays
+    name_scanner = SubstanceNameScanner.from_tables(snapshot.arrays("name_scanner"))
+    search_index = SubstanceSearchIndex.from_tables(snapshot.arrays("substance_search"))
+    filter_index = GadslFilterIndex(snapshot) # Small (a few hundred bitmaps), so built per process
+
+    return GadslDataset(snapshot, gadsl_by_cas, gadsl_by_name, source_sha256, name_scanner, search_index, filter_index)
+
+def _activate_gadsl_dataset(dataset, load_seconds):
+    """Atomically make `dataset` the one every new request uses."""
+    global _gadsl_dataset
+    _gadsl_dataset = dataset # A single reference assignment: readers see the old or the new list, never a mix
+    record_stage("gadsl_load", load_seconds)
+    GADSL_LOAD_SECONDS.set(load_seconds)
+    GADSL_ENTRIES.set(len(dataset.by_cas), index="cas_rn")
+    GADSL_ENTRIES.set(len(dataset.by_name), index="substance_name")
+    # Cached results are keyed on the list version; drop the ones of the previous list from memory
+    _msds_result_cache.clear_memory()
 
 def load_gadsl_data():
-    """Load GADSL dataset into memory, creating two lookup dictionaries."""
-    global _gadsl_data_by_cas, _gadsl_data_by_name
-    
-    temp_gadsl_by_cas = {}
-    temp_gadsl_by_name = {}
+    """Load GADSL dataset, creating two lookup mappings over the shared snapshot."""
+    global _gadsl_dataset
 
     try:
         logger.info(f"Loading GADSL data from: {GADSL_FILE_PATH}")
-        df = pd.read_excel(GADSL_FILE_PATH)
-
-        # --- MODIFICATION: EXCLUDING 'Effective date' COLUMN ---
-        df.rename(columns={
-            'GADSL #': "gadsl_hash",
-            'REF #': "ref_hash",
-            'Substance': "substance_name",
-            'CAS RN': "cas_rn",
-            'Classification': "classification",
-            'Reason Code': "reason_code",
-            'Source\n(Legal requirements, regulations)': "source",
-            # 'Effective date (Legal requirements, regulations)\n Date           |        Action required' is EXCLUDED
-            'Generic examples': "generic_examples",
-            'Reporting threshold\n(0.1% unless otherwise stated)': "reporting_threshold",
-            'First added': "first_added",
-            'Last revised': "last_revised"
-        }, inplace=True)
-        # --- END MODIFICATION ---
-
-        # Define all expected column names AFTER renaming
-        required_columns_check = [
-            "gadsl_hash", "ref_hash", "substance_name", "cas_rn", 
-            "classification", "reason_code", "source", 
-            "generic_examples", "reporting_threshold", "first_added", "last_revised"
-        ]
+        start = time.perf_counter()
+        dataset = _build_gadsl_dataset(GADSL_FILE_PATH, GADSL_SNAPSHOT_PATH)
+        # Assign to the global variable ONLY AFTER successful processing
+        _activate_gadsl_dataset(dataset, time.perf_counter() - start)
         
-        # Check if the DataFrame is empty or if any required columns are missing after renaming
-        if df.empty or not all(col in df.columns for col in required_columns_check):
-            missing_cols = [col for col in required_columns_check if col not in df.columns]
-            raise ValueError(f"GADSL file is empty or missing one or more required columns after renaming. Missing: {missing_cols}")
-
-        for _, row in df.iterrows():
-            cas_rn = str(row.get("cas_rn")).strip() if pd.notna(row.get("cas_rn")) else None
-            substance_name = str(row.get("substance_name")).strip() if pd.notna(row.get("substance_name")) else None
-
-            entry_data = {
-                "gadsl_hash": (str(row.get("gadsl_hash")).strip() if pd.notna(row.get("gadsl_hash")) else "N/A"),
-                "ref_hash": (str(row.get("ref_hash")).strip() if pd.notna(row.get("ref_hash")) else "N/A"),
-                "substance_name": (substance_name if substance_name else "N/A"), # Keep original case for display
-                "cas_rn": (cas_rn if cas_rn else "N/A"),
-                "classification": (str(row.get("classification")).strip() if pd.notna(row.get("classification")) else "N/A"),
-                "reason_code": (str(row.get("reason_code")).strip() if pd.notna(row.get("reason_code")) else "N/A"),
-                "source": (str(row.get("source")).strip() if pd.notna(row.get("source")) else "N/A"),
-                "generic_examples": (str(row.get("generic_examples")).strip() if pd.notna(row.get("generic_examples")) else "N/A"),
-                "reporting_threshold": (str(row.get("reporting_threshold")).strip() if pd.notna(row.get("reporting_threshold")) else "0.1%"), # Default to 0.1%
-                "first_added": (str(row.get("first_added")).strip() if pd.notna(row.get("first_added")) else "N/A"),
-                "last_revised": (str(row.get("last_revised")).strip() if pd.notna(row.get("last_revised")) else "N/A")
-            }
-            
-            # Store with consistent keys for lookup (stripped CAS, lowercased name)
-            if cas_rn and cas_rn != "N/A":
-                temp_gadsl_by_cas[cas_rn] = entry_data
-            if substance_name and substance_name != "N/A":
-                # Ensure substance names are stored in lowercase for robust matching
-                temp_gadsl_by_name[substance_name.lower()] = entry_data
-
-        # Assign to the global variables ONLY AFTER successful processing
-        _gadsl_data_by_cas = temp_gadsl_by_cas
-        _gadsl_data_by_name = temp_gadsl_by_name
-        
-        logger.info(f"✅ Successfully loaded {len(_gadsl_data_by_cas)} entries (by CAS) and {len(_gadsl_data_by_name)} entries (by Name)!")
+        logger.info(f"✅ Successfully loaded {len(_gadsl_dataset.by_cas)} entries (by CAS) and {len(_gadsl_dataset.by_name)} entries (by Name)!")
     except FileNotFoundError:
         logger.error(f"Error: GADSL file not found at {GADSL_FILE_PATH}")
-        _gadsl_data_by_cas = None
-        _gadsl_data_by_name = None
+        _gadsl_dataset = None
         raise # Re-raise to indicate critical startup failure
     except Exception as e:
         logger.error(f"Error loading GADSL data: {str(e)}", exc_info=True)
-        _gadsl_data_by_cas = None
-        _gadsl_data_by_name = None
+        _gadsl_dataset = None
         raise # Re-raise to indicate critical startup failure
 
+# --- Reloading a new GADSL revision without downtime ---
+# Only one process on a host parses a changed Excel file: the rebuild runs behind a lock file
+# next to the snapshot. Every worker polls the snapshot's header and maps a new version as soon
+# as it appears, so a single admin call or file change reaches all workers.
+def _refresh_snapshot_in_subprocess(source_path, snapshot_path):
+    """Parse a changed Excel file in a child process, so pandas never competes with request threads.
+
+    Returns the SHA-256 of the source file, which the snapshot now matches.
+    """
+    # Workers that noticed the same change wait here, then find the snapshot already current
+    with _gadsl_snapshot_build_lock(snapshot_path):
+        source_sha256 = compute_file_sha256(source_path)
+        try:
+            _open_current_gadsl_snapshot(snapshot_path, source_sha256)
+            return source_sha256 # Already current (e.g. another worker rebuilt it first)
+        except SnapshotError:
+            pass
+
+        # The snapshot CLI runs in a fresh interpreter, so it never re-imports the web server module
+        completed = subprocess.run(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "gadsl_snapshot.py"),
+             "--source", source_path, "--output", snapshot_path],
+            capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            last_line = (completed.stderr.strip().splitlines() or ["no output"])[-1] # The exception, below the traceback
+            raise RuntimeError(f"Building the GADSL snapshot failed: {last_line}")
+        return source_sha256
+
+def _reload_gadsl_snapshot(rebuild):
+    """Swap in the snapshot's version if it differs from the active one, rebuilding it from Excel first if asked."""
+    if not _reload_lock.acquire(blocking=False):
+        logger.info("GADSL reload already in progress, not starting another one.")
+        return False
+    try:
+        _reload_status.update(state="running", started_at=time.time(), finished_at=None, error=None)
+        start = time.perf_counter()
+        if rebuild:
+            source_sha256 = _refresh_snapshot_in_subprocess(GADSL_FILE_PATH, GADSL_SNAPSHOT_PATH)
+        else:
+            source_sha256 = read_snapshot_source(GADSL_SNAPSHOT_PATH)
+        if source_sha256 is None or (_gadsl_dataset is not None and source_sha256 == _gadsl_dataset.version):
+            logger.info("GADSL file unchanged, nothing to reload.")
+            _reload_status.update(state="idle", finished_at=time.time())
+            return False
+
+        logger.info(f"Reloading GADSL data from snapshot: {GADSL_SNAPSHOT_PATH}")
+        snapshot = _open_current_gadsl_snapshot(GADSL_SNAPSHOT_PATH, source_sha256)
+        dataset = _gadsl_dataset_from_snapshot(snapshot, source_sha256)
+        previous_version = _gadsl_dataset.version if _gadsl_dataset else None
+        _activate_gadsl_dataset(dataset, time.perf_counter() - start)
+
+        _reload_status.update(state="idle", finished_at=time.time())
+        logger.info(f"✅ Reloaded GADSL data: version {(previous_version or 'none')[:12]} -> {dataset.version[:12]}, "
+                    f"{len(dataset.by_cas)} entries (by CAS) and {len(dataset.by_name)} entries (by Name).")
+        start_rescreening(dataset) # Every worker calls this; the screening index lets only one of them run it
+        return True
+    except Exception as e:
+        logger.error(f"GADSL reload failed, still serving the previous version: {str(e)}", exc_info=True)
+        _reload_status.update(state="failed", finished_at=time.time(), error=str(e))
+        raise
+    finally:
+        _reload_lock.release()
+
+def reload_gadsl_data():
+    """Rebuild the shared snapshot from the current GADSL file and swap it in; the old one keeps serving on failure.
+
+    Returns True if a new version was activated in this process, False if the file was unchanged
+    or a reload was already running. The other workers map the new snapshot on their next poll.
+    Raises if the new list could not be loaded.
+    """
+    return _reload_gadsl_snapshot(rebuild=True)
+
+def sync_gadsl_snapshot():
+    """Map the shared snapshot if another process rebuilt it; returns True if a new version was activated."""
+    source_sha256 = read_snapshot_source(GADSL_SNAPSHOT_PATH)
+    if source_sha256 is None or (_gadsl_dataset is not None and source_sha256 == _gadsl_dataset.version):
+        return False # Cheap check first, so polling doesn't touch the reload status
+    return _reload_gadsl_snapshot(rebuild=False)
+
+def start_gadsl_reload():
+    """Run reload_gadsl_data() on a background thread; returns False if one is already running."""
+    if _reload_lock.locked():
+        return False
+
+    def run():
+        try:
+            reload_gadsl_data()
+        except Exception:
+            pass # Already logged; the previous dataset keeps serving
+
+    threading.Thread(target=run, name="gadsl-reload", daemon=True).start()
+    return True
+
+def start_gadsl_file_watcher(interval_seconds=WATCH_INTERVAL_SECONDS, watch_source=WATCH_GADSL_FILE):
+    """Poll the shared snapshot for new versions, and with `watch_source` the GADSL Excel file for changes."""
+    def file_signature():
+        try:
+            stat = os.stat(GADSL_FILE_PATH)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None # Missing while being replaced; try again on the next poll
+
+    def watch():
+        last_signature = file_signature()
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                signature = file_signature() if watch_source else None
+                if signature is not None and signature != last_signature:
+                    last_signature = signature
+                    logger.info("GADSL file changed on disk, reloading in the background.")
+                    reload_gadsl_data() # Rebuilds the snapshot once, whichever worker gets the lock
+                else:
+                    sync_gadsl_snapshot()
+            except Exception:
+                pass # Already logged; the previous dataset keeps serving
+
+    threading.Thread(target=watch, name="gadsl-file-watcher", daemon=True).start()
+    if watch_source:
+        logger.info(f"Watching {GADSL_FILE_PATH} and its snapshot for changes every {interval_seconds:g}s.")
+    else:
+        logger.info(f"Watching the GADSL snapshot for new versions every {interval_seconds:g}s.")
+
+# --- Re-screening stored documents against a new GADSL revision ---
+def get_screening_index():
+    """The document index shared by all processes, or None if it is disabled or can't be opened."""
+    global _screening_index, _screening_index_failed
+    if _screening_index is not None or _screening_index_failed or not SCREENING_INDEX_PATH:
+        return _screening_index
+    with _screening_index_lock:
+        if _screening_index is None and not _screening_index_failed:
+            try:
+                _screening_index = MsdsScreeningIndex(SCREENING_INDEX_PATH, max_documents=SCREENING_INDEX_MAX_DOCUMENTS)
+            except Exception as e:
+                # Screening works without it; only re-screening on list updates is lost
+                logger.warning(f"Could not open the MSDS screening index at {SCREENING_INDEX_PATH}: {e}")
+                _screening_index_failed = True
+    return _screening_index
+
+def _gadsl_key_fingerprints(dataset):
+    """Fingerprint of the entries behind every CAS RN and name key of a dataset."""
+    row = dataset.snapshot.row
+    fingerprints = {}
+    for key, row_ids in dataset.by_cas.iter_row_ids():
+        fingerprints[CAS_KEY_PREFIX + key] = fingerprint_entries([row(row_id) for row_id in row_ids])
+    for key, row_id in dataset.by_name.iter_row_ids():
+        fingerprints[NAME_KEY_PREFIX + key] = fingerprint_entries(row(row_id))
+    return fingerprints
+
+def _ensure_version_recorded(index, dataset):
+    """Store the key fingerprints of the dataset's version once, so it can be diffed against later versions."""
+    if dataset.version in _recorded_versions:
+        return
+    if not index.has_version(dataset.version):
+        with time_stage("screening_fingerprints"):
+            index.record_version(dataset.version, _gadsl_key_fingerprints(dataset))
+    _recorded_versions.add(dataset.version)
+
+def _record_screened_document(index, pdf_bytes, variant, document_name, dataset, details, matches):
+    """Add a processed document to the screening index; failures are logged, never raised."""
+    try:
+        with time_stage("screening_index_store"):
+            _ensure_version_recorded(index, dataset)
+            sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+            index.record_document(
+                f"{sha256}-{variant}" if variant else sha256, sha256, document_name, dataset.version,
+                details["section_text"], details["cas_rns"], details["name_keys"], matches,
+            )
+    except Exception as e:
+        logger.warning(f"Could not store the document in the MSDS screening index: {e}")
+
+def _added_name_phrases(dataset, diff):
+    """Searchable forms of the names added in `diff`, as the name scanner would match them."""
+    phrases = []
+    for key in diff["added"]:
+        if not key.startswith(NAME_KEY_PREFIX):
+            continue
+        row_id = dataset.by_name.row_id(key[len(NAME_KEY_PREFIX):])
+        for variant in substance_name_variants(dataset.snapshot.cell(row_id, "substance_name")):
+            normalized = normalize_substance_name(variant)
+            if len(normalized) > 3 and normalized not in COMMON_WORDS_TO_EXCLUDE:
+                phrases.append(variant)
+    return phrases
+
+def _rescreen_version(index, report_id, old_version, dataset):
+    """Re-match the documents screened against `old_version` that the change to `dataset` can affect."""
+    start = time.perf_counter()
+    # The documents handled by this run; others recorded meanwhile are left for a later run
+    screened = index.documents_at_version(old_version)
+    diff = index.diff_versions(old_version, dataset.version)
+    keys_changed = sum(len(keys) for keys in diff.values())
+    impacted = []
+    if keys_changed:
+        impacted = [document_id for document_id in index.impacted_documents(old_version, diff, _added_name_phrases(dataset, diff))
+                    if document_id in screened]
+
+    documents_checked = 0
+    documents_changed = 0
+    for documents in index.iter_document_batches(impacted):
+        results = []
+        changes = []
+        for document in documents:
+            if document["gadsl_version"] != old_version:
+                continue # Re-screened meanwhile, e.g. uploaded again
+            details = {}
+            matches = match_gadsl_in_text(document["text"], dataset, details)
+            results.append((document["id"], details["name_keys"], matches))
+            added, removed = diff_matches(document["matches"], matches)
+            if added or removed:
+                changes.append((document["id"], added, removed))
+        if not index.store_rescreened(report_id, dataset.version, results, changes):
+            # Taken over after this run went silent for too long; the other process finishes it
+            logger.warning(f"Re-screening report {report_id} was taken over by another process, stopping.")
+            return
+        documents_checked += len(results)
+        documents_changed += len(changes)
+    # The stored results of every other document are still right for the new list
+    index.move_documents(old_version, dataset.version, screened)
+    index.finish_report(report_id, "done", keys_changed=keys_changed)
+    record_stage("rescreen", time.perf_counter() - start)
+    logger.info(f"✅ Re-screened stored documents for GADSL {old_version[:12]} -> {dataset.version[:12]}: "
+                f"{keys_changed} keys changed, {documents_checked} documents checked, {documents_changed} with new results.")
+
+def rescreen_stored_documents(dataset=None):
+    """Bring the stored results of every indexed document up to `dataset`'s list version.
+
+    Only documents whose identifiers touch a key added, removed or changed since the version
+    they were screened against are matched again. Returns the ids of the reports written;
+    a version change another process is already handling is skipped. Documents recorded
+    against an old version after its change was handled are added to the existing report.
+    """
+    dataset = dataset or _gadsl_dataset
+    index = get_screening_index()
+    if index is None or dataset is None:
+        return []
+
+    _ensure_version_recorded(index, dataset)
+    report_ids = []
+    for old_version in index.document_versions():
+        if old_version == dataset.version:
+            continue
+        if not index.has_version(old_version):
+            logger.warning(f"No key fingerprints of GADSL version {old_version[:12]}, its documents can't be re-screened.")
+            continue
+        report_id = index.claim_report(old_version, dataset.version)
+        if report_id is None:
+            continue
+        try:
+            _rescreen_version(index, report_id, old_version, dataset)
+        except Exception as e:
+            logger.error(f"Re-screening documents of GADSL version {old_version[:12]} failed: {str(e)}", exc_info=True)
+            index.finish_report(report_id, "failed", error=str(e))
+        report_ids.append(report_id)
+    index.forget_unused_versions(dataset.version)
+    return report_ids
+
+def start_rescreening(dataset=None):
+    """Run rescreen_stored_documents() on a background thread."""
+    dataset = dataset or _gadsl_dataset
+
+    def run():
+        try:
+            rescreen_stored_documents(dataset)
+        except Exception as e:
+            logger.error(f"Re-screening stored documents failed: {str(e)}", exc_info=True)
+
+    threading.Thread(target=run, name="msds-rescreen", daemon=True).start()
+
+def get_rescreening_reports(limit=20):
+    """Latest re-screening reports (without their documents), or None if the index is disabled."""
+    index = get_screening_index()
+    return index.list_reports(limit) if index else None
+
+def get_rescreening_report(report_id):
+    """One re-screening report with every document whose matches changed, or None."""
+    index = get_screening_index()
+    return index.get_report(report_id) if index else None
+
 # --- Functions to expose the loaded data to other modules ---
+def get_gadsl_dataset():
+    """Returns the active GADSL dataset; hold on to it to see one consistent version for a whole request."""
+    return _gadsl_dataset
+
 def get_gadsl_data_by_cas():
     """Returns the loaded CAS lookup dictionary."""
-    return _gadsl_data_by_cas
+    return _gadsl_dataset.by_cas if _gadsl_dataset else None
 
 def get_gadsl_data_by_name():
     """Returns the loaded Substance Name lookup dictionary."""
-    return _gadsl_data_by_name
+    return _gadsl_dataset.by_name if _gadsl_dataset else None
+
+def get_gadsl_data_version():
+    """Returns the SHA-256 of the GADSL source file behind the loaded data."""
+    return _gadsl_dataset.version if _gadsl_dataset else None
+
+def get_gadsl_reload_status():
+    """Returns the active version of this worker, the shared snapshot's version and the state of the last reload."""
+    dataset = _gadsl_dataset
+    status = dict(_reload_status)
+    status["version"] = dataset.version if dataset else None
+    status["snapshot_version"] = read_snapshot_source(GADSL_SNAPSHOT_PATH) # Other workers follow this one
+    status["loaded_at"] = dataset.loaded_at if dataset else None
+    status["entries_by_cas"] = len(dataset.by_cas) if dataset else 0
+    status["entries_by_name"] = len(dataset.by_name) if dataset else 0
+    return status
+
+def get_msds_cache_stats():
+    """Returns hit/miss counters of the MSDS result cache."""
+    return _msds_result_cache.stats()
+
+def _cas_rn_lookup_key(value):
+    """Index key of a CAS RN as entered: its normalized form, or None if its check digit is wrong.
+
+    Values that aren't shaped like a CAS RN (e.g. EC numbers in the CAS RN column) are looked up as written.
+    """
+    cas_rn = normalize_cas_rn(value)
+    if cas_rn is None:
+        return value.strip()
+    return cas_rn if has_valid_check_digit(cas_rn) else None
+
+def _substance_name_row_id(substance_name, dataset):
+    """Row id of the entry named `substance_name`, ignoring case, spacing and hyphens; None if none."""
+    data = dataset.by_name
+    # Ensure consistency in lookup key: lower and strip
+    row_id = data.row_id(substance_name.lower().strip())
+    if row_id is None:
+        # Same name written differently ("lead-chromate", "Lead  Chromate")
+        key = dataset.search_index.find_exact(substance_name)
+        row_id = data.row_id(key) if key else None
+    return row_id
 
 # --- Lookup functions use the getter functions to access data ---
-def lookup_by_cas_rn(cas_rn):
-    """Search GADSL data by CAS number."""
-    data = get_gadsl_data_by_cas()
-    if data is None:
+def find_cas_rn_row_ids(cas_rn, dataset=None):
+    """Row ids of every entry listing a CAS number ([] if none, None if no list is loaded).
+
+    "0075-07-0" finds 75-07-0, and a number with a wrong check digit is rejected without a lookup.
+    """
+    dataset = dataset or _gadsl_dataset
+    if dataset is None:
         logger.error("GADSL data not loaded for CAS lookup.")
-        return {"error": "GADSL data not loaded on server."} # Return a proper error dict
-    
-    # Ensure consistency in lookup key: strip whitespace
-    result = data.get(cas_rn.strip())
-    if result:
-        return result
-    else:
-        return None # Return None if not found, let Flask handle the "not found" response
+        return None
 
-def lookup_by_substance_name(substance_name):
-    """Search GADSL data by substance name."""
-    data = get_gadsl_data_by_name()
-    if data is None:
+    with time_stage("lookup_cas_rn"):
+        key = _cas_rn_lookup_key(cas_rn)
+        row_ids = dataset.by_cas.row_ids(key) if key else []
+    if key is None:
+        logger.info(f"CAS RN '{cas_rn}' has an invalid check digit.")
+    LOOKUPS.inc(kind="cas_rn", matched=bool(row_ids))
+    return row_ids
+
+def find_substance_name_row_ids(substance_name, dataset=None):
+    """Row id of the entry named `substance_name`, as a list ([] if none, None if no list is loaded)."""
+    dataset = dataset or _gadsl_dataset
+    if dataset is None:
         logger.error("GADSL data not loaded for substance name lookup.")
+        return None
+
+    with time_stage("lookup_substance_name"):
+        row_id = _substance_name_row_id(substance_name, dataset)
+    LOOKUPS.inc(kind="substance_name", matched=row_id is not None)
+    return [] if row_id is None else [row_id]
+
+def lookup_by_cas_rn(cas_rn, dataset=None):
+    """Search GADSL data by CAS number (in `dataset`, defaulting to the active one).
+
+    Returns every entry listing the number ([] if none); see find_cas_rn_row_ids().
+    """
+    dataset = dataset or _gadsl_dataset
+    row_ids = find_cas_rn_row_ids(cas_rn, dataset=dataset)
+    if row_ids is None:
         return {"error": "GADSL data not loaded on server."} # Return a proper error dict
-    
-    # Ensure consistency in lookup key: lower and strip
-    result = data.get(substance_name.lower().strip())
-    if result:
-        return result
+    return [dataset.snapshot.row(row_id) for row_id in row_ids]
+
+def lookup_by_substance_name(substance_name, dataset=None):
+    """Search GADSL data by substance name (in `dataset`, defaulting to the active one)."""
+    dataset = dataset or _gadsl_dataset
+    row_ids = find_substance_name_row_ids(substance_name, dataset=dataset)
+    if row_ids is None:
+        return {"error": "GADSL data not loaded on server."} # Return a proper error dict
+    if row_ids:
+        return dataset.snapshot.row(row_ids[0])
     else:
         return None # Return None if not found
 
-def preprocess_image(image):
-    """Enhance image quality for better OCR recognition."""
-    image = image.convert("L") # Convert to grayscale
-    image = image.filter(ImageFilter.SHARPEN)
-    enhancer = ImageEnhance.Contrast(image)
-    image = enhancer.enhance(2) # Increase contrast
-    return image
+def entries_response_body(row_ids, dataset=None):
+    """`{"results": [...]}` JSON body of the entries `row_ids`, joined from their pre-serialized bytes."""
+    dataset = dataset or _gadsl_dataset
+    entry_json = dataset.entry_json.encoded # Sliced from the mapping, never decoded
+    return b'{"results": [' + b", ".join(entry_json(row_id) for row_id in row_ids) + b"]}\n"
+
+def suggest_substances(query, limit=10, time_budget_ms=SEARCH_TIME_BUDGET_MS, dataset=None):
+    """Ranked name suggestions for a partial or misspelled query: prefix matches first, then fuzzy ones."""
+    dataset = dataset or _gadsl_dataset
+    if dataset is None:
+        logger.error("GADSL data not loaded for substance suggestions.")
+        return {"error": "GADSL data not loaded on server."} # Return a proper error dict
+
+    data = dataset.by_name
+    index = dataset.search_index
+    limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+    suggestions = []
+    seen = set()
+
+    def add(key, match, score):
+        entry = data[key]
+        suggestions.append({
+            "substance_name": entry["substance_name"],
+            "cas_rn": entry["cas_rn"],
+            "classification": entry["classification"],
+            "match": match,
+            "score": score,
+        })
+        seen.add(key)
+
+    with time_stage("suggest_prefix"):
+        for key in index.suggest(query, limit):
+            add(key, "prefix", 1.0)
+    if len(suggestions) < limit:
+        # Over-fetch, since some fuzzy hits are already listed as prefix matches
+        with time_stage("suggest_fuzzy"):
+            for key, score in index.search(query, limit + len(suggestions), time_budget_ms):
+                if len(suggestions) >= limit or score < SEARCH_MIN_FUZZY_SCORE:
+                    break
+                if key not in seen:
+                    add(key, "fuzzy", score)
+    LOOKUPS.inc(kind="suggest", matched=bool(suggestions))
+    return suggestions
+
+def lookup_batch(identifiers, dataset=None):
+    """Resolve many identifiers against the in-memory indexes, yielding one record per identifier.
+
+    `identifiers` is an iterable of (kind, value, row) triples where kind is "cas_rn",
+    "substance_name" or "auto" (CAS RN if the value looks like one, substance name otherwise),
+    and row is passed through to the record so callers can match results to their input.
+    The whole batch is resolved against one dataset, even if a reload happens meanwhile.
+    """
+    dataset = dataset or _gadsl_dataset
+    if dataset is None:
+        logger.error("GADSL data not loaded for batch lookup.")
+        raise ValueError("GADSL data not loaded on server for batch lookup.")
+    cas_data = dataset.by_cas
+    entry = dataset.snapshot.row
+
+    for kind, value, row in identifiers:
+        start = time.perf_counter() # Timed per identifier, so time spent by the consumer isn't counted
+        if kind == "auto":
+            kind = "cas_rn" if normalize_cas_rn(value) else "substance_name"
+        if kind == "cas_rn":
+            key = _cas_rn_lookup_key(value)
+            results = cas_data.get(key, []) if key else []
+        else:
+            # Same matching as single name lookups, so "lead-chromate" finds "Lead chromate" here too
+            row_id = _substance_name_row_id(value, dataset)
+            results = [] if row_id is None else [entry(row_id)]
+        record_stage("lookup_batch_item", time.perf_counter() - start)
+        LOOKUPS.inc(kind=f"batch_{kind}", matched=bool(results))
+        yield {"row": row, "query": value, "type": kind, "results": results}
+
+def query_gadsl_entries(filters, cursor=0, limit=QUERY_DEFAULT_LIMIT, dataset=None):
+    """Entries matching `filters` (keyword arguments of GadslFilterIndex.query()), one page at a time.
+
+    Returns {"total": n, "entries": iterator of entry dicts, "next_cursor": row id or None}.
+    Entries come in list order starting at row id `cursor`, and are decoded as they are
+    iterated, so exporting the whole list never holds it in memory. limit=0 returns every match.
+    """
+    dataset = dataset or _gadsl_dataset
+    if dataset is None:
+        logger.error("GADSL data not loaded for filter query.")
+        raise ValueError("GADSL data not loaded on server for filter query.")
+
+    with time_stage("query_filter"):
+        bitmap = dataset.filter_index.query(**filters)
+        total = bitmap.bit_count()
+        page = bitmap >> cursor << cursor # Drop the rows before the cursor
+        next_cursor = None
+        if limit:
+            row_ids = []
+            for row_id in iter_bits(page):
+                if len(row_ids) == limit:
+                    next_cursor = row_id
+                    break
+                row_ids.append(row_id)
+        else:
+            row_ids = iter_bits(page)
+    LOOKUPS.inc(kind="query", matched=bool(total))
+    row = dataset.snapshot.row
+    return {"total": total, "entries": (row(row_id) for row_id in row_ids), "next_cursor": next_cursor}
+
+def find_gadsl_name_hits(text, dataset=None, words=None):
+    """Find every GADSL substance name in `text`, with the character offsets of each hit.
+
+    `words`, if given, are the words of `text` from tokenize_msds_text(), saving a second pass.
+    """
+    dataset = dataset or _gadsl_dataset
+    if dataset is None:
+        logger.error("GADSL data not loaded for substance name scan.")
+        raise ValueError("GADSL data not loaded on server for substance name scan.")
+    scanner = dataset.name_scanner
+
+    return [
+        {"key": key, "start": start, "end": end, "matched_text": text[start:end]}
+        for start, end, key in (scanner.scan(text) if words is None else scanner.scan_words(words))
+    ]
+
+def _reported_name_hits(name_hits):
+    """The name hits that count as matches, in document order.
 
-def process_msds_pdf_for_gadsl_matches(pdf_file_stream):
-    """Extract CAS numbers & substance names from PDF and match against GADSL dataset."""
-    cas_data = get_gadsl_data_by_cas()
-    name_data = get_gadsl_data_by_name()
+    A hit inside a longer one ("Lead" in "Lead chromate") is part of that name, not a mention of
+    its own, so only the longest hit at each place is kept. A single-word name written all in
+    lowercase is most likely an ordinary word ("may lead to irritation"), so like the
+    capitalized-phrase rule the scanner replaced, only "Lead" or "LEAD" is reported.
+    """
+    reported = []
+    longest = None # (start, end) of the hit that reaches furthest so far
+    for hit in sorted(name_hits, key=lambda hit: (hit["start"], -hit["end"])):
+        span = (hit["start"], hit["end"])
+        if longest is not None and hit["end"] <= longest[1] and span != longest:
+            continue # Nested inside a longer hit that starts at or before it
+        if longest is None or hit["end"] > longest[1]:
+            longest = span
+        matched_text = hit["matched_text"]
+        if matched_text.islower() and " " not in normalize_substance_name(matched_text):
+            continue
+        reported.append(hit)
+    return reported
 
-    if cas_data is None or name_data is None:
+def _iter_pdfplumber_page_texts(pdf_path, document_info):
+    """Yield the pdfplumber text of each page, or None for pages it cannot read.
+
+    The page count is stored in `document_info["page_count"]` as soon as it is known.
+    """
+    pages_read = 0
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            document_info["page_count"] = len(pdf.pages)
+            for page in pdf.pages:
+                with time_stage("pdf_text"):
+                    text = page.extract_text() or ""
+                yield text
+                pages_read += 1
+                page.close() # Drop the page's parsed objects, they're not needed any more
+    except Exception as e:
+        logger.warning(f"pdfplumber failed to extract text (might be scanned PDF): {e}")
+        # Leave the remaining pages to OCR
+        document_info["page_count"] = count_pdf_pages(pdf_path)
+        for _ in range(document_info["page_count"] - pages_read):
+            yield None
+
+def extract_msds_text(pdf_bytes, stop_at_section_4=STOP_AT_SECTION_4, progress=None):
+    """Extract the text of a PDF, page by page, OCR'ing only the pages that have no text layer.
+
+    `progress(stage, **details)`, if given, is called after every page.
+    """
+    # OCR workers are separate processes, so they read the document from a temporary file
+    fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+
+        page_texts = []
+        ocr_page_count = 0
+        section_3_seen = False
+        document_info = {}
+        pages = iter_page_texts(pdf_path, _iter_pdfplumber_page_texts(pdf_path, document_info), OCR_MIN_PAGE_TEXT_CHARS)
+        start = time.perf_counter()
+        try:
+            for page_number, text, was_ocr in pages:
+                page_texts.append(text)
+                ocr_page_count += was_ocr
+                if progress:
+                    progress("extracting_text", pages_done=page_number,
+                             page_count=document_info.get("page_count"), ocr_pages=ocr_page_count)
+
+                if stop_at_section_4:
+                    section_4_from = 0
+                    if not section_3_seen:
+                        section_3_header = SECTION_3_HEADER.search(text)
+                        section_3_seen = section_3_header is not None
+                        section_4_from = section_3_header.end() if section_3_header else 0
+                    if section_3_seen and SECTION_4_HEADER.search(text, section_4_from):
+                        logger.info(f"SECTION 4 reached on page {page_number}, skipping the remaining pages.")
+                        break
+        finally:
+            pages.close() # Cancels OCR of pages that are no longer needed
+            record_stage("extract_text", time.perf_counter() - start)
+    finally:
+        os.remove(pdf_path)
+
+    if ocr_page_count:
+        logger.info(f"OCR text extraction complete ({ocr_page_count} of {len(page_texts)} pages OCR'd).")
+    return "\n".join(page_texts)
+
+def match_gadsl_in_text(full_text, dataset=None, details=None):
+    """Find the GADSL entries mentioned in extracted MSDS text (Section 3 when present).
+
+    `details`, if given, is filled with what the matches were based on: the searched
+    "section_text", every normalized CAS RN in it ("cas_rns") and the matched "name_keys".
+    """
+    dataset = dataset or _gadsl_dataset
+    if dataset is None:
         logger.error("GADSL data not loaded for PDF processing.")
         raise ValueError("GADSL data not loaded on server for PDF processing.")
+    cas_data = dataset.by_cas
+    name_data = dataset.by_name
 
     matches = []
-    processed_cas_rns = set() # Use CAS RN to track unique matches for PDF
+    processed_row_ids = set() # Entries already reported, found by CAS RN or by name
+
+    if details is not None:
+        details.update(section_text=full_text, cas_rns=[], name_keys=[])
+    if not full_text.strip():
+        logger.warning("No searchable text found in PDF even after OCR.")
+        return matches
+
+    # Focus search on Section 3, if present, otherwise search whole document
+    with time_stage("section_3_search"):
+        section_3_span = find_section_3(full_text)
+    
+    section_text = full_text
+    if section_3_span:
+        section_text = full_text[section_3_span[0]:section_3_span[1]]
+        logger.info("SECTION 3 identified for detailed parsing.")
+    else:
+        logger.info("SECTION 3 not found, searching entire document.")
+
+    # --- Extract CAS numbers and words in one linear pass ---
+    with time_stage("tokenize"):
+        cas_numbers_found, words = tokenize_msds_text(section_text)
+    
+    # --- Drop the candidates no entry lists, after removing duplicates ---
+    # Index membership also rules out OCR garbage with a wrong check digit, so no per-candidate check is needed
+    with time_stage("cas_filter"):
+        by_cas = dataset.by_cas
+        normalized_cas_rns = dict.fromkeys(map(normalize_cas_rn, cas_numbers_found))
+        cas_rns = [cas for cas in normalized_cas_rns if cas in by_cas]
+
+    # --- Find substance names (Aho-Corasick scan over every GADSL name, one pass) ---
+    with time_stage("name_scan"):
+        name_hits = _reported_name_hits(find_gadsl_name_hits(section_text, dataset, words))
+
+    def add_match(row_id):
+        # Only add each entry once, however many of its CAS RNs and names the document mentions
+        if row_id not in processed_row_ids:
+            result = dataset.snapshot.row(row_id)
+            matches.append(result)
+            processed_row_ids.add(row_id)
+            logger.info(f"Match found in PDF: CAS RN {result['cas_rn']}, Name: {result['substance_name']}")
+
+    for cas in cas_rns: # Unique, in document order
+        for row_id in cas_data.row_ids(cas):
+            add_match(row_id)
+    for hit in name_hits:
+        logger.debug(f"Substance name hit '{hit['matched_text']}' at offsets {hit['start']}-{hit['end']}")
+        add_match(name_data.row_id(hit["key"]))
+
+    if details is not None:
+        details.update(section_text=section_text,
+                       cas_rns=[cas for cas in normalized_cas_rns if cas],
+                       name_keys=list(dict.fromkeys(hit["key"] for hit in name_hits)))
+    return matches
+
+def process_msds_pdf_for_gadsl_matches(pdf_file_stream, stop_at_section_4=STOP_AT_SECTION_4, progress=None, dataset=None,
+                                       document_name=None, screening_index=None, result_cache=None):
+    """Extract CAS numbers & substance names from PDF and match against GADSL dataset.
+
+    `progress(stage, **details)`, if given, is called as the document moves through the stages.
+    The document is matched against `dataset` (default: the active one) even if a reload
+    swaps in a new list while it is being OCR'd. If a `screening_index` is given (see
+    get_screening_index()), the processed document is added to it under `document_name`
+    (e.g. the uploaded file name), so it is re-screened when the list changes. Results are
+    cached in `result_cache` (default: the server's cache, see CHEMSURE_MSDS_CACHE_DIR).
+    """
+    dataset = dataset or _gadsl_dataset
+    result_cache = result_cache or _msds_result_cache
+
+    if dataset is None:
+        logger.error("GADSL data not loaded for PDF processing.")
+        raise ValueError("GADSL data not loaded on server for PDF processing.")
 
     try:
-        full_text = ""
-        # Attempt text extraction with pdfplumber first
-        try:
-            with pdfplumber.open(pdf_file_stream) as pdf:
-                # Concatenate text from all pages
-                full_text = "\n".join([page.extract_text() or "" for page in pdf.pages])
-        except Exception as e:
-            logger.warning(f"pdfplumber failed to extract text (might be scanned PDF): {e}")
-
-        # If pdfplumber yields little to no text, try OCR
-        if not full_text.strip() or len(full_text.strip()) < 50:
-            logger.info("Insufficient text detected with pdfplumber, attempting OCR...")
-            pdf_file_stream.seek(0) # Reset stream position for pdf2image
-            
-            pdf_bytes = pdf_file_stream.read()
-            images = convert_from_bytes(pdf_bytes, dpi=300) # Higher DPI for better OCR
-            full_text = "\n".join([pytesseract.image_to_string(preprocess_image(img)) for img in images])
-            logger.info("OCR text extraction complete.")
-
-        if not full_text.strip():
-            logger.warning("No searchable text found in PDF even after OCR.")
-            return []
-
-        # Focus search on Section 3, if present, otherwise search whole document
-        section_3_pattern = re.compile(
-            r"SECTION\s*3[:\s]*Composition/Information(?:.*?)on Ingredients.*?SECTION\s*4[:\s]*First Aid Measures",
-            re.IGNORECASE | re.DOTALL
-        )
-        section_3_match = section_3_pattern.search(full_text)
-        
-        section_text = full_text
-        if section_3_match:
-            section_text = section_3_match.group(0)
-            logger.info("SECTION 3 identified for detailed parsing.")
-        else:
-            logger.info("SECTION 3 not found, searching entire document.")
+        pdf_bytes = pdf_file_stream.read()
+        PDF_BYTES.inc(len(pdf_bytes))
 
-        # --- Extract CAS numbers ---
-        # CAS RN pattern: digits-digits-digit (e.g., 75-07-0, 1333-82-0, 13463-67-7)
-        cas_numbers_found = re.findall(r"\b\d{2,7}-\d{2}-\d\b", section_text)
-        
-        # --- Extract potential substance names (improved regex) ---
-        # Looks for sequences of capitalized words, possibly with hyphens or numbers (e.g., Benzoic Acid, 1,2-Dichloroethane)
-        # Excludes short common words or purely numeric/percentage values
-        substance_names_found = re.findall(
-            r"\b(?:[A-Z][a-z0-9]+(?:[\s-][A-Z]?[a-z0-9]+)*|\d{1,3}(?:,\d{3})*(?:\.\d+)?(?:-\d{1,3})?)\b(?:[\s-]\b[A-Z][a-z0-9]+(?:[\s-][A-Z]?[a-z0-9]+)*\b)*",
-            section_text
-        )
-        
-        # Filter common words and single characters that are not real substance names
-        common_words_to_exclude = {
-            "section", "table", "page", "figure", "date", "version", "composition", 
-            "information", "ingredients", "measure", "first", "health", "safety", "data",
-            "sheet", "product", "chemical", "hazard", "identification", "handling", "storage",
-            "exposure", "protection", "physical", "properties", "stability", "reactivity",
-            "toxicological", "ecological", "disposal", "considerations", "transport", "regulatory",
-            "other", "company", "address", "phone", "fax", "email"
-        }
-        substance_names_found = [
-            name.strip() for name in substance_names_found 
-            if len(name.strip()) > 3 # Minimum length
-            and not re.fullmatch(r"^\d+(\.\d+)?%$", name.strip()) # Exclude percentages
-            and not re.fullmatch(r"^\d+$", name.strip()) # Exclude pure numbers
-            and name.strip().lower() not in common_words_to_exclude # Exclude common words
-        ]
-        
-        # Consolidate and make unique for efficient lookup
-        unique_identifiers = set()
-        for cas in cas_numbers_found:
-            unique_identifiers.add(cas.strip())
-        for name in substance_names_found:
-            unique_identifiers.add(name.lower().strip()) # Store names in lowercase for lookup
-
-        for identifier in unique_identifiers:
-            result = None
-            if re.fullmatch(r"\b\d{2,7}-\d{2}-\d\b", identifier):
-                # This is a CAS RN, lookup in CAS data
-                result = lookup_by_cas_rn(identifier)
-            else:
-                # Treat as substance name, lookup in name data (already lowercased for lookup)
-                result = lookup_by_substance_name(identifier)
-            
-            if result and "error" not in result: # Ensure it's a valid result, not an error dict
-                # Only add if we haven't already processed this CAS RN to avoid duplicates from multiple matches
-                if result["cas_rn"] not in processed_cas_rns:
-                    matches.append(result)
-                    processed_cas_rns.add(result["cas_rn"])
-                    logger.info(f"Match found in PDF: CAS RN {result['cas_rn']}, Name: {result['substance_name']}")
+        # Repeat uploads of the same document against the same GADSL list are served from the cache
+        with time_stage("cache_lookup"):
+            variant = f"r{MSDS_MATCHING_REVISION}" + ("-s4" if stop_at_section_4 else "")
+            cache_key = make_msds_cache_key(pdf_bytes, dataset.version, variant)
+            cached = result_cache.get(cache_key)
+        if cached is not None:
+            MSDS_DOCUMENTS.inc(outcome="cached")
+            if screening_index is not None:
+                # Also a document cached before the index existed, or pruned from it since: the
+                # identifiers it was matched on are found again in the cached text, without OCR
+                details = {}
+                match_gadsl_in_text(cached["text"], dataset, details)
+                _record_screened_document(screening_index, pdf_bytes, "s4" if stop_at_section_4 else "", document_name,
+                                          dataset, details, cached["matches"])
+            logger.info(f"✅ Found {len(cached['matches'])} unique GADSL matches in PDF (cached result).")
+            return cached["matches"]
+
+        # pdfplumber text per page, with OCR only for the pages that have none
+        full_text = extract_msds_text(pdf_bytes, stop_at_section_4=stop_at_section_4, progress=progress)
+        if progress:
+            progress("matching", text_length=len(full_text))
+        details = {}
+        with time_stage("match"):
+            matches = match_gadsl_in_text(full_text, dataset, details)
+        with time_stage("cache_store"):
+            result_cache.put(cache_key, {"text": full_text, "matches": matches})
+        if screening_index is not None:
+            _record_screened_document(screening_index, pdf_bytes, "s4" if stop_at_section_4 else "", document_name,
+                                      dataset, details, matches)
 
+        MSDS_DOCUMENTS.inc(outcome="processed")
         logger.info(f"✅ Found {len(matches)} unique GADSL matches in PDF.")
         return matches
     except Exception as e:
+        MSDS_DOCUMENTS.inc(outcome="failed")
         logger.error(f"Error processing PDF: {str(e)}", exc_info=True)
-        raise # Re-raise to be caught by the Flask endpoint
\ No newline at end of file
+        raise # Re-raise to be caught by the Flask endpoint
@@ -0,0 +1,565 @@
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timezone
+
+# --- Reproducible benchmarks for loading, lookups and MSDS processing ---
+# Usage:
+#   python benchmark_chemsure.py --output before.json
+#   (make a change)
+#   python benchmark_chemsure.py --output after.json --compare before.json
+# Every input is generated locally from the GADSL list with a fixed seed (no network access);
+# results are written as JSON so two runs can be compared.
+
+BENCHMARK_FORMAT_VERSION = 1
+DEFAULT_SEED = 1234
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize_seconds(samples):
+    """Latency summary (milliseconds) of a list of durations in seconds."""
+    values = sorted(samples)
+    return {
+        "runs": len(values),
+        "min_ms": round(values[0] * 1000, 4),
+        "median_ms": round(statistics.median(values) * 1000, 4),
+        "p95_ms": round(_percentile(values, 0.95) * 1000, 4),
+        "p99_ms": round(_percentile(values, 0.99) * 1000, 4),
+        "max_ms": round(values[-1] * 1000, 4),
+    }
+
+
+def _time_calls(func, arguments):
+    """Call `func` once per argument; returns (per-call durations, calls per second)."""
+    durations = []
+    perf_counter = time.perf_counter
+    started = perf_counter()
+    for argument in arguments:
+        start = perf_counter()
+        func(argument)
+        durations.append(perf_counter() - start)
+    elapsed = perf_counter() - started
+    return durations, round(len(arguments) / elapsed, 1) if elapsed else None
+
+
+# --- Generated MSDS corpus ---
+
+def make_text_pdf(pages):
+    """Minimal PDF with a text layer; `pages` is a list of pages, each a list of text lines."""
+    objects = []
+
+    def add(data):
+        objects.append(data)
+        return len(objects) # Object numbers start at 1
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = font_id + 2 * len(pages) + 1 # Each page adds a content stream and a page object first
+    page_ids = []
+    for lines in pages:
+        operators = ["BT /F1 9 Tf 36 806 Td 11 TL"]
+        for line in lines:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            operators.append(f"({escaped}) Tj T*")
+        operators.append("ET")
+        stream = "\n".join(operators).encode("cp1252", errors="replace")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)
+        ))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids)))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, data in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + data + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref_offset)
+    return bytes(out)
+
+
+def make_image_pdf(pages, dpi=150):
+    """PDF of rendered page images without any text layer, like a scanned document."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.load_default(size=int(dpi / 72 * 10))
+    except TypeError:
+        font = ImageFont.load_default() # Pillow < 10.1 has a single bitmap size
+    images = []
+    for lines in pages:
+        image = Image.new("L", (int(8.27 * dpi), int(11.69 * dpi)), 255)
+        draw = ImageDraw.Draw(image)
+        y = int(0.5 * dpi)
+        for line in lines:
+            draw.text((int(0.5 * dpi), y), line, fill=0, font=font)
+            y += int(dpi / 72 * 14)
+        images.append(image)
+    buffer = io.BytesIO()
+    images[0].save(buffer, format="PDF", save_all=True, append_images=images[1:], resolution=dpi)
+    return buffer.getvalue()
+
+
+_SDS_SECTIONS = [
+    "SECTION 1: Identification of the substance/mixture and of the company/undertaking",
+    "SECTION 2: Hazards identification",
+    "SECTION 3: Composition/Information on Ingredients",
+    "SECTION 4: First Aid Measures",
+    "SECTION 5: Firefighting measures",
+    "SECTION 6: Accidental release measures",
+    "SECTION 7: Handling and storage",
+    "SECTION 8: Exposure controls/personal protection",
+    "SECTION 9: Physical and chemical properties",
+    "SECTION 10: Stability and reactivity",
+    "SECTION 11: Toxicological information",
+    "SECTION 12: Ecological information",
+    "SECTION 13: Disposal considerations",
+    "SECTION 14: Transport information",
+    "SECTION 15: Regulatory information",
+    "SECTION 16: Other information",
+]
+_FILLER_WORDS = (
+    "product mixture handling storage ventilation exposure skin eyes contact water temperature "
+    "container label transport regulation protective equipment gloves respiratory stable reactive "
+    "disposal waste local national requirements information supplier emergency telephone"
+).split()
+
+
+def build_sds_pages(rng, ingredients, page_count, with_section_3=True, lines_per_page=60):
+    """Text lines of a synthetic SDS: `ingredients` are (name, cas_rn) pairs listed in Section 3.
+
+    Without Section 3 headers the ingredients are mentioned in running text on the first page,
+    so the whole document has to be searched.
+    """
+    def filler_line():
+        return " ".join(rng.choice(_FILLER_WORDS) for _ in range(rng.randint(8, 14))).capitalize() + "."
+
+    composition = [f"{name}    CAS No. {cas_rn}    {rng.randint(1, 30)} %" for name, cas_rn in ingredients]
+    pages = [[] for _ in range(page_count)]
+    if with_section_3:
+        # Sections 1-3 on the first page, the remaining sections spread over the other pages
+        pages[0] = [_SDS_SECTIONS[0], filler_line(), filler_line(), _SDS_SECTIONS[1], filler_line(),
+                    _SDS_SECTIONS[2], "Substance name    Identifier    Concentration", *composition]
+        remaining = _SDS_SECTIONS[3:]
+        for i, heading in enumerate(remaining):
+            page = 1 + i * (page_count - 1) // len(remaining) if page_count > 1 else 0
+            pages[page].append(heading)
+    else:
+        pages[0] = ["Safety information for the product", filler_line(),
+                    "This product contains " + ", ".join(f"{name} ({cas_rn})" for name, cas_rn in ingredients) + "."]
+    for page in pages:
+        while len(page) < lines_per_page:
+            page.append(filler_line())
+    return pages
+
+
+def generate_msds_corpus(entries, seed=DEFAULT_SEED, include_scanned=True):
+    """Named documents: {"pdf": bytes, "pages": n, "expected_cas_rns": [...], "kind": "text"|"scanned"}.
+
+    Documents may also list "unexpected_cas_rns", entries that a correct matcher must not report.
+    """
+    rng = random.Random(seed)
+    # Ingredients are drawn from real GADSL entries with a plain, printable, unique name and a
+    # well-formed CAS RN, so every one of them is expected to be found
+    name_counts = Counter(entry["substance_name"].lower() for entry in entries)
+    candidates = sorted(
+        (entry["substance_name"], entry["cas_rn"]) for entry in entries
+        if re.fullmatch(r"\d{2,7}-\d{2}-\d", entry["cas_rn"]) and name_counts[entry["substance_name"].lower()] == 1
+        and "\n" not in entry["substance_name"] and len(entry["substance_name"]) < 60 and entry["substance_name"].isascii()
+    )
+    specs = [
+        ("text_sds_3_pages", "text", 3, True),
+        ("text_sds_40_pages_section_3", "text", 40, True),
+        ("text_sds_40_pages_no_section_3", "text", 40, False),
+    ]
+    if include_scanned:
+        specs.append(("scanned_sds_3_pages", "scanned", 3, True))
+
+    corpus = {}
+    for name, kind, page_count, with_section_3 in specs:
+        ingredients = rng.sample(candidates, 5)
+        pages = build_sds_pages(rng, ingredients, page_count, with_section_3)
+        pdf = make_text_pdf(pages) if kind == "text" else make_image_pdf(pages)
+        corpus[name] = {
+            "pdf": pdf,
+            "kind": kind,
+            "pages": page_count,
+            "section_3": with_section_3,
+            "expected_cas_rns": sorted(cas_rn for _, cas_rn in ingredients),
+        }
+
+    # Compounds whose names contain another GADSL name, and that name used as an ordinary word:
+    # only the compounds may be reported, not the elements inside their names or the verb "lead"
+    cas_rn_by_name = {entry["substance_name"].lower(): entry["cas_rn"] for entry in entries}
+    nested = [("Lead chromate", "Lead"), ("Nickel oxide", "Nickel")]
+    if all(name.lower() in cas_rn_by_name for pair in nested for name in pair):
+        ingredients = [(compound, cas_rn_by_name[compound.lower()]) for compound, _ in nested]
+        pages = build_sds_pages(rng, ingredients, 3)
+        # Right after the composition table, inside the Section 3 text that is searched
+        composition_end = pages[0].index(_SDS_SECTIONS[2]) + 2 + len(ingredients)
+        pages[0].insert(composition_end, "Prolonged exposure may lead to irritation of the skin.")
+        corpus["text_sds_nested_names"] = {
+            "pdf": make_text_pdf(pages),
+            "kind": "text",
+            "pages": 3,
+            "section_3": True,
+            "expected_cas_rns": sorted(cas_rn for _, cas_rn in ingredients),
+            "unexpected_cas_rns": sorted(cas_rn_by_name[element.lower()] for _, element in nested),
+        }
+    return corpus
+
+
+def ocr_tools_available():
+    """Tesseract and Poppler are needed to process scanned documents."""
+    return bool(shutil.which("tesseract") and shutil.which("pdftoppm"))
+
+
+# --- Benchmarks ---
+
+_COLD_START_CHILD = r"""
+import json, os, time
+started = time.perf_counter()
+import backend_gadsl_lookup_api as backend
+imported = time.perf_counter()
+backend.load_gadsl_data()
+loaded = time.perf_counter()
+memory = {}
+try:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS", "RssAnon", "RssFile")):
+                key, value = line.split(":")
+                memory[key.lower() + "_kb"] = int(value.split()[0])
+except OSError:
+    import resource
+    memory["maxrss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_s": imported - started, "load_s": loaded - imported, **memory}))
+"""
+
+
+def bench_cold_start(repeats):
+    """load_gadsl_data() in fresh interpreters: from the snapshot, and from Excel (no snapshot)."""
+    results = {}
+    for variant in ("snapshot", "excel"):
+        runs = []
+        for _ in range(repeats):
+            env = dict(os.environ)
+            scratch_dir = None
+            if variant == "excel":
+                scratch_dir = tempfile.mkdtemp(prefix="chemsure-bench-")
+                env["GADSL_SNAPSHOT_PATH"] = os.path.join(scratch_dir, "missing.snapshot")
+            try:
+                completed = subprocess.run(
+                    [sys.executable, "-c", _COLD_START_CHILD], cwd=SCRIPT_DIR, env=env,
+                    capture_output=True, text=True, check=True,
+                )
+            finally:
+                if scratch_dir:
+                    shutil.rmtree(scratch_dir, ignore_errors=True)
+            runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+        result = summarize_seconds([run["load_s"] for run in runs])
+        result["import"] = summarize_seconds([run["import_s"] for run in runs])
+        for key in runs[0]:
+            if key.endswith("_kb"):
+                result[key] = max(run[key] for run in runs)
+        results[variant] = result
+    return results
+
+
+def bench_lookups(backend, rng, count):
+    """Single CAS/name lookups (hits, normalized names, misses), batch lookups and suggestions."""
+    cas_keys = sorted(backend.get_gadsl_data_by_cas())
+    name_entries = [backend.get_gadsl_data_by_name()[key]["substance_name"] for key in sorted(backend.get_gadsl_data_by_name())]
+    cas_sample = [rng.choice(cas_keys) for _ in range(count)]
+    name_sample = [rng.choice(name_entries) for _ in range(count)]
+    # Same names written differently, resolved through the normalized fallback
+    variant_sample = [name.upper().replace(" ", "-") for name in name_sample]
+    miss_sample = [f"{rng.randint(10, 9999999)}-{rng.randint(10, 99)}-{rng.randint(0, 9)}" for _ in range(count)]
+
+    results = {}
+    for name, func, sample in (
+        ("cas_rn_hit", backend.lookup_by_cas_rn, cas_sample),
+        ("cas_rn_miss", backend.lookup_by_cas_rn, miss_sample),
+        ("substance_name_hit", backend.lookup_by_substance_name, name_sample),
+        ("substance_name_normalized", backend.lookup_by_substance_name, variant_sample),
+        # What the HTTP lookup endpoints do: row ids joined from the pre-serialized entry JSON
+        ("cas_rn_response_body", lambda cas_rn: backend.entries_response_body(backend.find_cas_rn_row_ids(cas_rn)), cas_sample),
+    ):
+        durations, ops_per_second = _time_calls(func, sample)
+        results[name] = {**summarize_seconds(durations), "ops_per_s": ops_per_second}
+
+    # Batch: a bill of materials mixing CAS RNs, names and unknown identifiers
+    identifiers = [("auto", value, row) for row, value in enumerate(
+        rng.choice((cas_sample[i], name_sample[i], miss_sample[i])) for i in range(count)
+    )]
+    batch_runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _record in backend.lookup_batch(identifiers):
+            pass
+        batch_runs.append(time.perf_counter() - start)
+    results["batch"] = {**summarize_seconds(batch_runs), "identifiers": count,
+                        "identifiers_per_s": round(count / statistics.median(batch_runs), 1)}
+
+    # Typeahead: 3-6 character prefixes of real names, and the same with a typo
+    prefixes = [name[:rng.randint(3, 6)] for name in name_sample[:min(count, 500)]]
+    typos = [prefix[:-2] + prefix[-1] + prefix[-2] if len(prefix) > 3 else prefix for prefix in prefixes]
+    for name, sample in (("suggest_prefix", prefixes), ("suggest_typo", typos)):
+        durations, ops_per_second = _time_calls(backend.suggest_substances, sample)
+        results[name] = {**summarize_seconds(durations), "ops_per_s": ops_per_second}
+
+    # Filter queries: the first page of a compliance report, and a full export of the list
+    report_filters = {"classification": ["P"], "reason_code": ["LR"],
+                      "date_ranges": {"last_revised": (date(2024, 1, 1), None)}}
+    for name, filters, limit in (("query_report_page", report_filters, 100), ("query_export_all", {}, 0)):
+        durations, ops_per_second = _time_calls(
+            lambda arguments: list(backend.query_gadsl_entries(arguments, limit=limit)["entries"]), [filters] * 50
+        )
+        results[name] = {**summarize_seconds(durations), "ops_per_s": ops_per_second}
+    return results
+
+
+def bench_msds(backend, corpus, repeats):
+    """End-to-end process_msds_pdf_for_gadsl_matches() latency per generated document."""
+    from chemsure_metrics import get_request_timings, start_request_timings
+    from msds_result_cache import MsdsResultCache
+
+    results = {}
+    default_cache = backend._msds_result_cache
+    try:
+        for name, document in corpus.items():
+            if document["kind"] == "scanned" and not ocr_tools_available():
+                results[name] = {"skipped": "Tesseract/Poppler not installed"}
+                continue
+
+            for stop_at_section_4 in ((False, True) if document["section_3"] else (False,)):
+                key = name + ("_stop_at_section_4" if stop_at_section_4 else "")
+                durations = []
+                stage_samples = {}
+                for _ in range(repeats):
+                    backend._msds_result_cache = MsdsResultCache(disk_dir=None) # Measure uncached processing
+                    start_request_timings()
+                    start = time.perf_counter()
+                    matches = backend.process_msds_pdf_for_gadsl_matches(
+                        io.BytesIO(document["pdf"]), stop_at_section_4=stop_at_section_4
+                    )
+                    durations.append(time.perf_counter() - start)
+                    for stage, seconds in get_request_timings().items():
+                        stage_samples.setdefault(stage, []).append(seconds)
+
+                # A repeat upload of the same document, served from the result cache
+                start = time.perf_counter()
+                backend.process_msds_pdf_for_gadsl_matches(io.BytesIO(document["pdf"]), stop_at_section_4=stop_at_section_4)
+                cached_seconds = time.perf_counter() - start
+
+                found = {match["cas_rn"] for match in matches}
+                results[key] = {
+                    **summarize_seconds(durations),
+                    "pages": document["pages"],
+                    "pdf_bytes": len(document["pdf"]),
+                    "pages_per_s": round(document["pages"] / statistics.median(durations), 2),
+                    "cached_ms": round(cached_seconds * 1000, 4),
+                    "matches": len(matches),
+                    "expected_found": sum(cas_rn in found for cas_rn in document["expected_cas_rns"]),
+                    "expected": len(document["expected_cas_rns"]),
+                    "unexpected_found": sum(cas_rn in found for cas_rn in document.get("unexpected_cas_rns", ())),
+                    "stages_median_ms": {stage: round(statistics.median(samples) * 1000, 4)
+                                         for stage, samples in sorted(stage_samples.items())},
+                }
+    finally:
+        backend._msds_result_cache = default_cache
+    return results
+
+
+# Worst-case inputs for the MSDS text scan: any super-linear regex shows up as a scaling ratio
+# well above 2 when the input size doubles, and as a blown budget
+TOKENIZER_BUDGET_SECONDS_PER_MB = 2.0
+
+
+def _adversarial_texts(rng, size):
+    """Generated texts of about `size` characters that used to make the section regex backtrack."""
+    def repeat(unit):
+        return (unit * (size // len(unit) + 1))[:size]
+
+    noise_alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 -/:.,;()\n\t_%"
+    return {
+        # Many SECTION 3 headers (and ingredient markers) but no SECTION 4 header
+        "section_3_without_4": repeat("SECTION 3: Composition/Information on Ingredients 75-07-0 "),
+        "digit_hyphen_runs": repeat("1234567-12-1-12-1234-12-12-1-"),
+        "whitespace_after_section": repeat("SECTION" + " " * 200 + "\n"),
+        "ocr_noise": "".join(rng.choice(noise_alphabet) for _ in range(size)),
+    }
+
+
+def bench_tokenizer(backend, rng, sizes):
+    """match_gadsl_in_text() (section search, tokenizing, CAS and name matching) on worst-case texts."""
+    results = {}
+    for size in sizes:
+        for name, text in _adversarial_texts(rng, size).items():
+            runs = []
+            for _ in range(3):
+                start = time.perf_counter()
+                backend.match_gadsl_in_text(text)
+                runs.append(time.perf_counter() - start)
+            results.setdefault(name, {})[f"{size // 1024}_kb"] = min(runs)
+
+    mb = 1024 * 1024
+    summary = {}
+    for name, timings in results.items():
+        seconds = [timings[f"{size // 1024}_kb"] for size in sizes]
+        seconds_per_mb = max(s / (size / mb) for s, size in zip(seconds, sizes))
+        summary[name] = {
+            "seconds": {key: round(value, 4) for key, value in timings.items()},
+            "seconds_per_mb": round(seconds_per_mb, 4),
+            # Time ratio when the input doubles: ~2 is linear, ~8 would be cubic
+            "scaling_ratio": round(seconds[-1] / seconds[-2], 2) if seconds[-2] else None,
+            "within_budget": seconds_per_mb <= TOKENIZER_BUDGET_SECONDS_PER_MB,
+        }
+    return summary
+
+
+def _git_commit():
+    try:
+        completed = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                                   capture_output=True, text=True, check=True)
+        return completed.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(only=None, quick=False, seed=DEFAULT_SEED):
+    """Run the selected benchmark groups ("load", "lookup", "msds", "tokenizer") and return the results document."""
+    only = set(only or ("load", "lookup", "msds", "tokenizer"))
+    rng = random.Random(seed)
+    report = {
+        "format_version": BENCHMARK_FORMAT_VERSION,
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "quick": quick,
+            "ocr_available": ocr_tools_available(),
+        },
+        "results": {},
+    }
+
+    if "load" in only:
+        logger.info("Benchmarking GADSL cold start...")
+        report["results"]["cold_start"] = bench_cold_start(repeats=2 if quick else 5)
+
+    if only & {"lookup", "msds", "tokenizer"}:
+        import backend_gadsl_lookup_api as backend
+
+        backend.load_gadsl_data()
+        report["meta"]["gadsl_version"] = backend.get_gadsl_data_version()[:16]
+        if "lookup" in only:
+            logger.info("Benchmarking lookups...")
+            report["results"]["lookups"] = bench_lookups(backend, rng, count=2000 if quick else 20000)
+        if "msds" in only:
+            logger.info("Benchmarking MSDS processing...")
+            entries = list(backend.get_gadsl_dataset().snapshot.iter_rows())
+            corpus = generate_msds_corpus(entries, seed=seed)
+            report["results"]["msds"] = bench_msds(backend, corpus, repeats=2 if quick else 5)
+        if "tokenizer" in only:
+            logger.info("Benchmarking worst-case MSDS text scanning...")
+            sizes = (256 * 1024, 512 * 1024) if quick else (1024 * 1024, 2 * 1024 * 1024)
+            report["results"]["tokenizer"] = bench_tokenizer(backend, rng, sizes)
+    return report
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def compare_reports(baseline, current):
+    """Lines comparing the medians and throughputs of two result documents."""
+    old = dict(_flatten(baseline["results"]))
+    lines = []
+    for key, value in _flatten(current["results"]):
+        if not key.endswith(("median_ms", "p99_ms", "_per_s", "_kb")) or key not in old or not old[key]:
+            continue
+        change = (value - old[key]) / old[key] * 100
+        lines.append(f"{key:<70} {old[key]:>14.4f} -> {value:>14.4f}  ({change:+.1f}%)")
+    return lines
+
+
+def budget_failures(report):
+    """Lines naming every tokenizer case of `report` that exceeded TOKENIZER_BUDGET_SECONDS_PER_MB."""
+    return [
+        f"{name}: {result['seconds_per_mb']:.4f} s/MB exceeds the budget of {TOKENIZER_BUDGET_SECONDS_PER_MB:g} s/MB"
+        for name, result in report["results"].get("tokenizer", {}).items()
+        if not result["within_budget"]
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark GADSL loading, lookups, MSDS processing and worst-case text scanning.")
+    parser.add_argument("--output", help="Write the JSON results to this file (default: stdout).")
+    parser.add_argument("--compare", help="Print the changes against a previous JSON results file.")
+    parser.add_argument("--only", help="Comma-separated groups to run: load, lookup, msds, tokenizer.")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions, for a fast smoke run.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed of the generated inputs.")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if a worst-case text exceeds the tokenizer budget (for CI).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+    only = [group.strip() for group in args.only.split(",")] if args.only else None
+    if args.check and only is not None and "tokenizer" not in only:
+        parser.error("--check needs the tokenizer group (add it to --only)")
+    report = run_benchmarks(only=only, quick=args.quick, seed=args.seed)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n".join(compare_reports(baseline, report)), file=sys.stderr)
+
+    if args.check:
+        failures = budget_failures(report)
+        if failures:
+            print("\n".join(failures), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import codecs
+import csv
+import itertools
+import re
+
+# --- Reading identifiers for batch screening ---
+# A bill of materials arrives either as JSON lists or as an uploaded CSV/XLSX file. Both are
+# turned into a lazy stream of (kind, value, row) triples, kind being "cas_rn", "substance_name"
+# or "auto" (decided per value) and row the 1-based position in the file or JSON list, so
+# thousands of rows are never held in memory at once.
+
+BOM_FILE_EXTENSIONS = (".csv", ".xlsx")
+
+# Header names (lowercased, punctuation removed) recognised as identifier columns
+_CAS_HEADER_PATTERN = re.compile(r"\bcas\b")
+_NAME_HEADER_PATTERN = re.compile(r"\b(substance|chemical|name|ingredient)\b")
+# Cells that are values rather than column names; a row containing one is never a header
+_CAS_RN_CELL_PATTERN = re.compile(r"^\d{2,7}-?\d{2}-?\d$")
+
+
+class BomFormatError(ValueError):
+    """Raised when a batch request or BOM file cannot be interpreted."""
+
+
+def iter_json_identifiers(payload):
+    """(kind, value, row) triples from {"cas_rns": [...], "substance_names": [...], "identifiers": [...]}."""
+    if not isinstance(payload, dict):
+        raise BomFormatError("Request body must be a JSON object.")
+
+    lists = {"cas_rns": "cas_rn", "substance_names": "substance_name", "identifiers": "auto"}
+    if not any(key in payload for key in lists):
+        raise BomFormatError("Provide 'cas_rns', 'substance_names' and/or 'identifiers' lists in the request body.")
+    for key in lists:
+        if key in payload and not isinstance(payload[key], list):
+            raise BomFormatError(f"'{key}' must be a list.")
+
+    def generate():
+        for key, kind in lists.items():
+            for row, value in enumerate(payload.get(key, []), start=1):
+                if value is not None and str(value).strip():
+                    yield kind, str(value).strip(), row
+
+    return generate()
+
+
+def _looks_like_data(cell):
+    """True for cells no header would contain: CAS RNs and numbers (concentrations, quantities)."""
+    text = str(cell if cell is not None else "").strip()
+    if isinstance(cell, (int, float)) or _CAS_RN_CELL_PATTERN.match(text):
+        return True
+    try:
+        float(text.rstrip("%").replace(",", "."))
+        return True
+    except ValueError:
+        return False
+
+
+def _column_kinds(header):
+    """Map column index -> identifier kind from a header row, or None if it is not a header.
+
+    A row holding a CAS RN or a number is data even if another cell reads like a header
+    ("Chemical name" as the substance of a headerless BOM), so it is never taken as one.
+    """
+    if any(_looks_like_data(cell) for cell in header):
+        return None
+    kinds = {}
+    for index, cell in enumerate(header):
+        label = re.sub(r"[^a-z0-9]+", " ", str(cell or "").lower())
+        if _CAS_HEADER_PATTERN.search(label):
+            kinds[index] = "cas_rn"
+        elif _NAME_HEADER_PATTERN.search(label):
+            kinds[index] = "substance_name"
+    return kinds or None
+
+
+def _iter_row_identifiers(rows, has_header=None, skipped_rows=None):
+    """(kind, value, row) triples from table rows; without a recognised header, the first column is used.
+
+    has_header None detects the header row, True/False say whether the first row is one.
+    A first row skipped as header is appended to `skipped_rows` (if given) so it can be reported.
+    """
+    rows = iter(rows)
+    first_row = next(rows, None)
+    if first_row is None:
+        return
+    kinds = _column_kinds(first_row) if has_header is not False else None
+    if kinds is None and has_header:
+        kinds = {0: "auto"} # A header naming no known column: screen the first column below it
+    first_data_row = 2
+    if kinds is None:
+        kinds = {0: "auto"}
+        rows = itertools.chain([first_row], rows) # The first row is data, not a header
+        first_data_row = 1
+    elif skipped_rows is not None:
+        values = [str(cell).strip() for cell in first_row if cell is not None and str(cell).strip()]
+        skipped_rows.append({"row": 1, "reason": "header", "values": values})
+
+    for row_number, row in enumerate(rows, start=first_data_row):
+        for index, kind in kinds.items():
+            if index < len(row) and row[index] is not None and str(row[index]).strip():
+                yield kind, str(row[index]).strip(), row_number
+
+
+def iter_bom_file_identifiers(stream, filename, has_header=None, skipped_rows=None):
+    """(kind, value, row) triples from an uploaded CSV or XLSX bill of materials, read row by row.
+
+    `has_header` and `skipped_rows` are passed to _iter_row_identifiers().
+    """
+    filename = (filename or "").lower()
+    if filename.endswith(".csv"):
+        # utf-8-sig strips the byte order mark Excel puts at the start of exported CSVs
+        text = codecs.getreader("utf-8-sig")(stream, errors="replace")
+        return _iter_row_identifiers(csv.reader(text), has_header, skipped_rows)
+    if filename.endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        try:
+            workbook = load_workbook(stream, read_only=True, data_only=True)
+        except Exception as e:
+            raise BomFormatError(f"Could not read the XLSX file: {e}")
+
+        def generate():
+            try:
+                yield from _iter_row_identifiers(workbook.active.iter_rows(values_only=True), has_header, skipped_rows)
+            finally:
+                workbook.close() # Read-only workbooks keep the file open until closed
+        return generate()
+    raise BomFormatError(f"Unsupported BOM file type. Allowed: {', '.join(BOM_FILE_EXTENSIONS)}")
@@ -0,0 +1,272 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# --- Offline bulk screening of SDS PDFs ---
+# Usage:
+#   python bulk_screen_msds.py supplier_sds/ archive.zip --output results.jsonl
+#   python bulk_screen_msds.py supplier_sds/ --output results.csv --resume
+# Walks directories and zip archives for PDFs and runs each one through the same pipeline as
+# /upload_msds_pdf, one document per process on every core. A result is written (and flushed)
+# as soon as its document is done, so an interrupted run loses nothing; --resume skips the
+# documents that already have a result in the output file. A run keeps its own result cache
+# and doesn't touch the server's cache or screening index unless --cache-dir/--index point there.
+
+# CSV output: one row per GADSL match, or a single row for documents without matches / errors
+CSV_COLUMNS = ["file", "status", "match_count", "cas_rn", "substance_name", "classification",
+               "reason_code", "error", "sha256", "gadsl_version", "seconds"]
+
+logger = logging.getLogger(__name__)
+
+
+def iter_pdf_sources(paths):
+    """(file id, path, zip member or None) of every PDF in the given files, directories and zip archives."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort() # Deterministic order, so runs and resumed runs walk files the same way
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    if name.lower().endswith(".pdf"):
+                        yield os.path.normpath(file_path), file_path, None
+                    elif name.lower().endswith(".zip"):
+                        yield from _iter_zip_pdfs(file_path)
+        elif path.lower().endswith(".zip"):
+            yield from _iter_zip_pdfs(path)
+        elif path.lower().endswith(".pdf"):
+            yield os.path.normpath(path), path, None
+        else:
+            logger.warning(f"Skipping {path}: not a PDF, zip archive or directory.")
+
+
+def _iter_zip_pdfs(archive_path):
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            members = sorted(info.filename for info in archive.infolist()
+                             if not info.is_dir() and info.filename.lower().endswith(".pdf"))
+    except (OSError, zipfile.BadZipFile) as e:
+        logger.error(f"Could not read zip archive {archive_path}: {e}")
+        return
+    for member in members:
+        yield f"{os.path.normpath(archive_path)}!{member}", archive_path, member
+
+
+# --- Worker processes ---
+
+_worker_archives = {} # Open zip archives of this worker, by path
+_worker_cache = None # Result cache of this run (memory only unless --cache-dir is given)
+_worker_index = None # Screening index given with --index, or None
+
+
+def _init_worker(cache_dir=None, index_path=None):
+    global _worker_cache, _worker_index
+    import backend_gadsl_lookup_api as backend
+    import msds_ocr
+    from msds_result_cache import MsdsResultCache
+    from msds_screening_index import MsdsScreeningIndex
+
+    logging.getLogger().setLevel(logging.WARNING) # Per-match INFO logs would drown the progress output
+    logging.getLogger("backend_gadsl_lookup_api").setLevel(logging.CRITICAL) # Failures are reported per file
+    msds_ocr.OCR_MAX_WORKERS = 0 # Every core already runs a document; OCR them in this process
+    backend.load_gadsl_data()
+    _worker_cache = MsdsResultCache(max_memory_entries=backend.MSDS_CACHE_MEMORY_ENTRIES, disk_dir=cache_dir,
+                                    max_disk_bytes=backend.MSDS_CACHE_MAX_BYTES)
+    if index_path:
+        _worker_index = MsdsScreeningIndex(index_path, max_documents=backend.SCREENING_INDEX_MAX_DOCUMENTS)
+
+
+def _read_source(path, member):
+    if member is None:
+        with open(path, "rb") as f:
+            return f.read()
+    archive = _worker_archives.get(path)
+    if archive is None:
+        archive = _worker_archives[path] = zipfile.ZipFile(path)
+    return archive.read(member)
+
+
+def screen_pdf(file_id, path, member, stop_at_section_4):
+    """Screen one document; returns its result record (errors are reported, never raised)."""
+    import backend_gadsl_lookup_api as backend
+
+    record = {"file": file_id, "status": "ok"}
+    start = time.perf_counter()
+    try:
+        pdf_bytes = _read_source(path, member)
+        record["sha256"] = hashlib.sha256(pdf_bytes).hexdigest()
+        dataset = backend.get_gadsl_dataset()
+        matches = backend.process_msds_pdf_for_gadsl_matches(
+            io.BytesIO(pdf_bytes), stop_at_section_4=stop_at_section_4, dataset=dataset, document_name=file_id,
+            screening_index=_worker_index, result_cache=_worker_cache
+        )
+        record["gadsl_version"] = dataset.version[:16]
+        record["match_count"] = len(matches)
+        record["matches"] = matches
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+# --- Output ---
+
+def _truncate_partial_line(path):
+    """Drop an incomplete last line left by an interrupted run."""
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def read_finished_files(output_path, output_format, retry_errors=False):
+    """File ids that already have a result in an existing output file."""
+    if not os.path.exists(output_path):
+        return set()
+    _truncate_partial_line(output_path)
+    finished = set()
+    with open(output_path, encoding="utf-8", newline="") as f:
+        if output_format == "csv":
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for record in records:
+            if record.get("status") == "ok" or not retry_errors:
+                finished.add(record["file"])
+    return finished
+
+
+class ResultWriter:
+    """Appends result records to a JSONL or CSV file, flushing after every document."""
+
+    def __init__(self, stream, output_format, write_header):
+        self.stream = stream
+        self.output_format = output_format
+        if output_format == "csv" and write_header:
+            csv.writer(stream).writerow(CSV_COLUMNS)
+
+    def write(self, record):
+        if self.output_format == "csv":
+            # All rows of a document are written in one go, so a crash can't leave half of them
+            rows = io.StringIO()
+            writer = csv.DictWriter(rows, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+            base = {key: record.get(key, "") for key in CSV_COLUMNS}
+            for match in record.get("matches") or [{}]:
+                writer.writerow({**base, **{key: match.get(key, "") for key in
+                                            ("cas_rn", "substance_name", "classification", "reason_code")}})
+            self.stream.write(rows.getvalue())
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+def run_bulk_screening(paths, output, output_format="jsonl", workers=None, resume=False,
+                       retry_errors=False, stop_at_section_4=False, cache_dir=None, index_path=None):
+    """Screen every PDF under `paths`, appending results to `output` (a path, or "-" for stdout).
+
+    Results are cached on disk in `cache_dir` and documents recorded in the screening index at
+    `index_path` only when those are given; by default a run leaves the server's state alone.
+    """
+    from backend_gadsl_lookup_api import ensure_gadsl_snapshot
+
+    # Built once here, so the workers only map the snapshot instead of each parsing the Excel file
+    ensure_gadsl_snapshot()
+    workers = workers or os.cpu_count() or 1
+
+    finished = set()
+    if output == "-":
+        stream = sys.stdout
+        write_header = True
+    else:
+        if resume:
+            finished = read_finished_files(output, output_format, retry_errors)
+            logger.info(f"Resuming: {len(finished)} documents already have a result in {output}.")
+        write_header = not (resume and os.path.exists(output) and os.path.getsize(output))
+        stream = open(output, "a" if resume else "w", encoding="utf-8", newline="")
+    writer = ResultWriter(stream, output_format, write_header)
+
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    started = time.monotonic()
+    sources = iter_pdf_sources(paths)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(cache_dir, index_path))
+    try:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            # Keep a bounded number of documents queued, so huge trees are never listed up front
+            while not exhausted and len(pending) < 2 * workers:
+                source = next(sources, None)
+                if source is None:
+                    exhausted = True
+                elif source[0] in finished:
+                    counts["skipped"] += 1
+                else:
+                    pending.add(pool.submit(screen_pdf, *source, stop_at_section_4))
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                writer.write(record)
+                counts[record["status"]] += 1
+                if record["status"] == "error":
+                    logger.warning(f"Failed to screen {record['file']}: {record['error']}")
+                processed = counts["ok"] + counts["error"]
+                if processed % 100 == 0:
+                    rate = processed / (time.monotonic() - started)
+                    logger.info(f"{processed} documents screened ({rate:.1f}/s), {counts['error']} errors.")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if stream is not sys.stdout:
+            stream.close()
+
+    logger.info(f"✅ Bulk screening finished: {counts['ok']} screened, {counts['error']} failed, "
+                f"{counts['skipped']} skipped (already done) in {time.monotonic() - started:.1f}s.")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen directories and zip archives of SDS PDFs against the GADSL list.")
+    parser.add_argument("paths", nargs="+", help="PDF files, directories (searched recursively) or zip archives.")
+    parser.add_argument("--output", "-o", default="-", help="Result file (.jsonl or .csv); default: JSONL on stdout.")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Output format (default: from the file extension).")
+    parser.add_argument("--workers", type=int, help="Documents processed in parallel (default: one per CPU core).")
+    parser.add_argument("--resume", action="store_true", help="Append to the output, skipping documents already in it.")
+    parser.add_argument("--retry-errors", action="store_true", help="With --resume, screen failed documents again.")
+    parser.add_argument("--stop-at-section-4", action="store_true", help="Stop reading a document after its SECTION 4 header.")
+    parser.add_argument("--cache-dir", help="Keep results in this directory, so reruns skip unchanged documents "
+                                            "(default: no disk cache; the server's is .msds_cache).")
+    parser.add_argument("--index", help="Record screened documents in this screening index, so they are re-screened "
+                                        "when the list changes (default: not recorded; the server's is "
+                                        ".msds_index/screening.sqlite3).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    logging.getLogger("backend_gadsl_lookup_api").setLevel(logging.WARNING)
+    output_format = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    if args.resume and args.output == "-":
+        parser.error("--resume needs an --output file.")
+
+    try:
+        counts = run_bulk_screening(args.paths, args.output, output_format, workers=args.workers, resume=args.resume,
+                                    retry_errors=args.retry_errors, stop_at_section_4=args.stop_at_section_4,
+                                    cache_dir=args.cache_dir, index_path=args.index)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; run again with --resume to continue where this run stopped.")
+        sys.exit(130)
+    sys.exit(1 if counts["error"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import re
+
+# --- CAS Registry Numbers: normalization and check digits ---
+# A CAS RN is 2-7 digits, 2 digits and a check digit (e.g. 75-07-0, 13463-67-7). The check digit
+# is the sum of the other digits, weighted 1, 2, 3, ... from the right, modulo 10, so most
+# single-character OCR and typing errors produce a number that cannot exist.
+#
+# Lookups are keyed on the normalized form: surrounding whitespace removed and leading zeros
+# dropped from the first group, so "0075-07-0" from an OCR'd SDS finds 75-07-0.
+
+# Leading zeros are allowed here (and stripped by normalize_cas_rn), unlike in real CAS RNs
+_CAS_RN_SHAPE = re.compile(r"0*(\d{2,7})-(\d{2})-(\d)")
+# Every CAS RN inside a longer value, e.g. a GADSL cell listing several of them on separate lines
+_CAS_RN_IN_TEXT = re.compile(r"(?<!\w)\d+-\d{2}-\d(?!\w)")
+
+
+def normalize_cas_rn(value):
+    """Canonical form of a CAS RN ("0075-07-0 " -> "75-07-0"), or None if `value` isn't shaped like one."""
+    match = _CAS_RN_SHAPE.fullmatch(value.strip())
+    if match is None:
+        return None
+    return "-".join(match.groups())
+
+
+def has_valid_check_digit(cas_rn):
+    """Whether the last digit of a normalized CAS RN matches the weighted sum of the others."""
+    digits = cas_rn.replace("-", "")
+    total = 0
+    for weight, digit in enumerate(reversed(digits[:-1]), start=1):
+        total += weight * (ord(digit) - 48)
+    return total % 10 == ord(digits[-1]) - 48
+
+
+def split_cas_rns(value):
+    """Normalized CAS RNs listed in `value`, in order and without duplicates."""
+    found = (normalize_cas_rn(candidate) for candidate in _CAS_RN_IN_TEXT.findall(value))
+    return list(dict.fromkeys(cas_rn for cas_rn in found if cas_rn))
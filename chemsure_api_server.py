@@ -1,14 +1,50 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, url_for, g
+import csv
+import gzip
+import hmac
+import io
+import json
 import logging
 import os
+import shutil
+import tempfile
+import time
+import zlib
+
+from chemsure_metrics import (
+    HTTP_REQUEST_SECONDS, MSDS_CACHE_STATS, MSDS_JOB_QUEUE, REGISTRY,
+    format_server_timing, get_request_timings, start_request_timings
+)
+from bom_screening import BomFormatError, iter_bom_file_identifiers, iter_json_identifiers
+from gadsl_filter_index import GadslQueryError, parse_query_arguments
+from msds_job_queue import MsdsJobQueue, QueueFullError
 
 # Import the necessary functions from your backend logic
 from backend_gadsl_lookup_api import (
     load_gadsl_data, 
-    lookup_by_cas_rn, 
-    lookup_by_substance_name, 
+    entries_response_body,
+    find_cas_rn_row_ids,
+    find_substance_name_row_ids,
+    lookup_batch,
+    query_gadsl_entries,
+    suggest_substances,
     process_msds_pdf_for_gadsl_matches,
-    get_gadsl_data_by_cas # Used for initial data load check
+    get_gadsl_data_by_cas, # Used for initial data load check
+    get_gadsl_dataset,
+    get_gadsl_reload_status,
+    get_msds_cache_stats,
+    get_rescreening_report,
+    get_rescreening_reports,
+    get_screening_index,
+    reload_gadsl_data,
+    start_gadsl_reload,
+    start_gadsl_file_watcher,
+    start_rescreening,
+    GADSL_FIELDS,
+    QUERY_DEFAULT_LIMIT,
+    QUERY_MAX_LIMIT,
+    STOP_AT_SECTION_4,
+    SEARCH_TIME_BUDGET_MS
 )
 
 # Configure logging for the Flask application
@@ -17,6 +53,19 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Background MSDS jobs: worker threads, waiting-job limit and the directory shared by all web workers
+MSDS_JOB_WORKERS = int(os.environ.get("CHEMSURE_MSDS_JOB_WORKERS", 2))
+MSDS_JOB_QUEUE_SIZE = int(os.environ.get("CHEMSURE_MSDS_JOB_QUEUE_SIZE", 16))
+MSDS_JOB_TTL_SECONDS = int(os.environ.get("CHEMSURE_MSDS_JOB_TTL_SECONDS", 3600))
+MSDS_JOB_DIR = os.environ.get("CHEMSURE_MSDS_JOB_DIR", os.path.join(os.path.dirname(__file__), ".msds_jobs"))
+# Shared secret for the /admin endpoints; they are disabled when it is not set
+ADMIN_TOKEN = os.environ.get("CHEMSURE_ADMIN_TOKEN")
+# JSON, NDJSON and CSV responses of at least this size (and every streamed one) are gzipped for
+# clients that accept it; smaller ones cost more to compress than they save on the wire
+GZIP_MIN_BYTES = int(os.environ.get("CHEMSURE_GZIP_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("CHEMSURE_GZIP_LEVEL", 6))
+_COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/csv"}
+
 # Attempt to load GADSL data on Flask app startup
 # This ensures the data is available for all requests
 try:
@@ -25,6 +74,8 @@ try:
     
     if get_gadsl_data_by_cas(): # Check if data was loaded successfully
         logger.info("GADSL data loaded successfully in this process context.")
+        # Stored results of documents screened against an earlier list are brought up to date
+        start_rescreening()
     else:
         # This case should ideally not be reached if load_gadsl_data raises on error
         logger.warning("GADSL data failed to load in this process context, get_gadsl_data_by_cas() returned None.")
@@ -35,68 +86,318 @@ except Exception as e:
     # if data loading is absolutely critical and cannot be recovered.
     # For now, we'll let the endpoints return 503 if data is None.
 
+# Every worker follows the shared snapshot, so a reload handled by any one of them reaches all
+start_gadsl_file_watcher()
+
+# Every request works on the GADSL dataset that was active when it arrived, even if a reload
+# swaps in a new list halfway through, and reports that version back to the client
+@app.before_request
+def pin_gadsl_dataset():
+    g.gadsl_dataset = get_gadsl_dataset()
+
+@app.after_request
+def add_gadsl_version_header(response):
+    dataset = g.get("gadsl_dataset")
+    if dataset is not None:
+        response.headers["X-GADSL-Version"] = dataset.version[:16]
+    return response
+
+# Per-stage timings of each request go to the latency histograms on /metrics and, for the
+# client, into a Server-Timing header (shown in the browser's network panel)
+@app.before_request
+def start_timing():
+    g.request_started = time.perf_counter()
+    start_request_timings()
+
+@app.after_request
+def add_server_timing_header(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    response.headers["Server-Timing"] = format_server_timing(get_request_timings(), elapsed)
+    HTTP_REQUEST_SECONDS.observe(elapsed, endpoint=request.endpoint or "unknown",
+                                 method=request.method, status=response.status_code)
+    return response
+
+def _gzip_stream(chunks):
+    """gzip a streamed body, sending compressed data whenever the compressor emits some."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) # wbits=31: gzip container
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+# Conditional GETs and compression. A response with an ETag (see _entries_response) is answered
+# with 304 when the client already holds it. Otherwise large and streamed API responses are
+# gzipped per Accept-Encoding; the gzipped body is a different representation, so it gets its
+# own strong ETag ("...-gzip"), which is what a gzip-accepting client sends back next time.
+@app.after_request
+def encode_response(response):
+    if response.status_code != 200 or response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+    compressible = response.mimetype in _COMPRESSIBLE_MIMETYPES
+    if compressible:
+        response.vary.add("Accept-Encoding")
+    compress = compressible and request.accept_encodings["gzip"] > 0 and (
+        response.is_streamed or (response.content_length or 0) >= GZIP_MIN_BYTES
+    )
+
+    etag, weak = response.get_etag()
+    if etag:
+        if compress:
+            response.set_etag(etag + "-gzip", weak)
+        if request.method in ("GET", "HEAD"):
+            response.make_conditional(request) # 304 without a body if If-None-Match matches
+            if response.status_code == 304:
+                return response
+
+    if compress:
+        if response.is_streamed:
+            response.response = _gzip_stream(response.response)
+            response.headers.pop("Content-Length", None)
+        else:
+            response.set_data(gzip.compress(response.get_data(), GZIP_LEVEL, mtime=0)) # Same bytes every time
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
 # Route for the main page
 @app.route("/")
 def index():
     # Flask looks for templates in the 'templates' folder by default
     return render_template("index.html")
 
+# Lookups answer GET /lookup_by_cas_rn?cas_rn=... (cacheable) or a POST with a JSON body
+def _lookup_argument(name):
+    """`name` from the query string (GET, HEAD) or the JSON body (POST), or None."""
+    if request.method in ("GET", "HEAD"):
+        return request.args.get(name)
+    data = request.get_json(silent=True)
+    return data.get(name) if isinstance(data, dict) else None
+
+# Lookup bodies are joined from entry JSON serialized once per list version. The strong ETag is
+# the list version plus the rows answered, which together fix the body, so clients and proxies
+# revalidate with If-None-Match and get a bodiless 304 until a reload changes the version.
+def _entries_response(row_ids, dataset):
+    response = Response(entries_response_body(row_ids, dataset), mimetype="application/json")
+    response.set_etag(f"{dataset.version[:16]}-{'.'.join(map(str, row_ids)) or 'none'}")
+    response.headers["Cache-Control"] = "no-cache" # Cache, but revalidate: a reload can change the answer
+    return response
+
 # API endpoint for searching by CAS RN
-@app.route("/lookup_by_cas_rn", methods=["POST"])
+@app.route("/lookup_by_cas_rn", methods=["GET", "POST"])
 def lookup_cas():
+    cas_rn = None
     try:
         # Check if GADSL data is loaded before attempting a lookup
         if get_gadsl_data_by_cas() is None:
             logger.error("Attempted CAS lookup, but GADSL data was not loaded.")
             return jsonify({"error": "Server data not ready. Please try again later (GADSL data failed to load)."}), 503
 
-        data = request.get_json()
-        if not data or "cas_rn" not in data:
-            return jsonify({"error": "CAS number is required in the request body."}), 400
-        
-        cas_rn = data["cas_rn"]
-        # Call the backend lookup function
-        result = lookup_by_cas_rn(cas_rn)
-
-        # Return the result as an array, even if empty, for consistency with frontend
-        if result: # If a result was found (not None)
-            return jsonify({"results": [result]})
-        else: # If no result was found
+        cas_rn = _lookup_argument("cas_rn")
+        if not cas_rn:
+            return jsonify({"error": "CAS number is required ('cas_rn' query parameter or JSON body field)."}), 400
+
+        # Every entry listing the CAS RN (several GADSL rows can share one); an empty array if none
+        row_ids = find_cas_rn_row_ids(cas_rn, dataset=g.gadsl_dataset)
+        if not row_ids:
             logger.info(f"CAS RN '{cas_rn}' not found in GADSL.")
-            return jsonify({"results": []}) # Return an empty array
-            
+        return _entries_response(row_ids, g.gadsl_dataset)
+
     except Exception as e:
-        logger.error(f"Error in lookup_by_cas_rn endpoint for '{request.get_json().get('cas_rn', 'N/A')}': {str(e)}", exc_info=True)
+        logger.error(f"Error in lookup_by_cas_rn endpoint for '{cas_rn}': {str(e)}", exc_info=True)
         return jsonify({"error": "An internal server error occurred during CAS lookup. Please check the server logs."}), 500
 
 # API endpoint for searching by Substance Name
-@app.route("/lookup_by_substance_name", methods=["POST"])
+@app.route("/lookup_by_substance_name", methods=["GET", "POST"])
 def lookup_substance():
+    substance_name = None
     try:
         # Check if GADSL data is loaded
         if get_gadsl_data_by_cas() is None: # Can use either cas or name data getter for this check
             logger.error("Attempted substance name lookup, but GADSL data was not loaded.")
             return jsonify({"error": "Server data not ready. Please try again later (GADSL data failed to load)."}), 503
 
-        data = request.get_json()
-        if not data or "substance_name" not in data:
-            return jsonify({"error": "Substance name is required in the request body."}), 400
-        
-        substance_name = data["substance_name"]
-        # Call the backend lookup function
-        result = lookup_by_substance_name(substance_name)
-
-        # Return the result as an array, even if empty
-        if result: # If a result was found (not None)
-            return jsonify({"results": [result]})
-        else: # If no result was found
+        substance_name = _lookup_argument("substance_name")
+        if not substance_name:
+            return jsonify({"error": "Substance name is required ('substance_name' query parameter or JSON body field)."}), 400
+
+        # The matching entry as a one-element array, or an empty array
+        row_ids = find_substance_name_row_ids(substance_name, dataset=g.gadsl_dataset)
+        if not row_ids:
             logger.info(f"Substance name '{substance_name}' not found in GADSL.")
-            return jsonify({"results": []}) # Return an empty array
-            
+        return _entries_response(row_ids, g.gadsl_dataset)
+
     except Exception as e:
-        logger.error(f"Error in lookup_by_substance_name endpoint for '{request.get_json().get('substance_name', 'N/A')}': {str(e)}", exc_info=True)
+        logger.error(f"Error in lookup_by_substance_name endpoint for '{substance_name}': {str(e)}", exc_info=True)
         return jsonify({"error": "An internal server error occurred during substance name lookup. Please check the server logs."}), 500
 
+# API endpoint for typeahead / typo-tolerant substance name suggestions, called as the user types
+@app.route("/suggest_substances", methods=["GET"])
+def suggest_substances_endpoint():
+    try:
+        if get_gadsl_data_by_cas() is None:
+            logger.error("Attempted substance suggestions, but GADSL data was not loaded.")
+            return jsonify({"error": "Server data not ready. Please try again later (GADSL data failed to load)."}), 503
+
+        query = request.args.get("q", "").strip()
+        if not query:
+            return jsonify({"query": query, "suggestions": []})
+        limit = request.args.get("limit", 10, type=int)
+        # Callers may tighten the latency budget, but not raise it above 200 ms
+        budget_ms = min(request.args.get("budget_ms", SEARCH_TIME_BUDGET_MS, type=float), 200.0)
+
+        suggestions = suggest_substances(query, limit=limit, time_budget_ms=budget_ms, dataset=g.gadsl_dataset)
+        return jsonify({"query": query, "suggestions": suggestions})
+    except Exception as e:
+        logger.error(f"Error in suggest_substances endpoint for '{request.args.get('q', 'N/A')}': {str(e)}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred during substance suggestions. Please check the server logs."}), 500
+
+def _get_bom_header_option():
+    """The 'header' form field of a BOM upload: None (detect), True or False."""
+    header = request.form.get("header", "auto").lower()
+    if header == "auto":
+        return None
+    if header in ("1", "true", "yes", "0", "false", "no"):
+        return header in ("1", "true", "yes")
+    raise BomFormatError("'header' must be 'auto', 'true' or 'false'.")
+
+# API endpoint for screening many identifiers (e.g. a whole bill of materials) in one request.
+# Accepts JSON {"cas_rns": [...], "substance_names": [...], "identifiers": [...]} or a CSV/XLSX
+# upload in the "bom_file" field, and streams one NDJSON line per identifier as it is resolved.
+@app.route("/lookup_batch", methods=["POST"])
+def lookup_batch_endpoint():
+    bom_copy = None
+    skipped_rows = [] # Filled while streaming, e.g. with the header row of an uploaded file
+    try:
+        if get_gadsl_data_by_cas() is None:
+            logger.error("Attempted batch lookup, but GADSL data was not loaded.")
+            return jsonify({"error": "Server data not ready. Please try again later (GADSL data failed to load)."}), 503
+
+        if "bom_file" in request.files:
+            bom_file = request.files["bom_file"]
+            has_header = _get_bom_header_option()
+            # The upload is closed when the view returns, before the streamed body is read,
+            # so the rows are read from a copy owned by the response instead
+            bom_copy = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+            shutil.copyfileobj(bom_file.stream, bom_copy)
+            bom_copy.seek(0)
+            identifiers = iter_bom_file_identifiers(bom_copy, bom_file.filename, has_header, skipped_rows)
+        else:
+            data = request.get_json(silent=True)
+            if data is None:
+                return jsonify({"error": "Send a JSON body or a CSV/XLSX file in the 'bom_file' field."}), 400
+            identifiers = iter_json_identifiers(data)
+    except BomFormatError as e:
+        if bom_copy is not None:
+            bom_copy.close()
+        return jsonify({"error": str(e)}), 400
+
+    dataset = g.gadsl_dataset
+    def generate():
+        total = matched = 0
+        try:
+            for record in lookup_batch(identifiers, dataset=dataset):
+                total += 1
+                matched += bool(record["results"])
+                yield json.dumps(record) + "\n"
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band as the last line
+            logger.error(f"Error in lookup_batch stream after {total} identifiers: {str(e)}", exc_info=True)
+            yield json.dumps({"error": f"Batch lookup failed after {total} identifiers: {str(e)}"}) + "\n"
+            return
+        finally:
+            if bom_copy is not None:
+                bom_copy.close()
+        summary = {"total": total, "matched": matched}
+        if skipped_rows:
+            summary["skipped_rows"] = skipped_rows
+        yield json.dumps({"summary": summary}) + "\n"
+
+    logger.info("Streaming batch lookup results.")
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# API endpoint for filtered reports and exports of the list, e.g.
+# GET /query_gadsl?classification=P&reason_code=LR&revised_since=2024-01-01&format=csv
+# Filters are answered from bitmap indexes; pages are streamed as JSON (default) or CSV, and
+# the next page is requested with ?cursor=<next_cursor>. limit=0 exports every match at once.
+@app.route("/query_gadsl", methods=["GET"])
+def query_gadsl_endpoint():
+    try:
+        if get_gadsl_data_by_cas() is None:
+            logger.error("Attempted GADSL query, but GADSL data was not loaded.")
+            return jsonify({"error": "Server data not ready. Please try again later (GADSL data failed to load)."}), 503
+
+        output_format = request.args.get("format", "json").lower()
+        if output_format not in ("json", "csv"):
+            return jsonify({"error": "'format' must be 'json' or 'csv'."}), 400
+        limit = request.args.get("limit", QUERY_DEFAULT_LIMIT, type=int)
+        cursor = request.args.get("cursor", 0, type=int)
+        if limit is None or not 0 <= limit <= QUERY_MAX_LIMIT or cursor is None or cursor < 0:
+            return jsonify({"error": f"'limit' must be between 0 (everything) and {QUERY_MAX_LIMIT}, 'cursor' a row id from a previous page."}), 400
+
+        filters = parse_query_arguments(request.args.to_dict(flat=False))
+        dataset = g.gadsl_dataset
+        page = query_gadsl_entries(filters, cursor=cursor, limit=limit, dataset=dataset)
+    except GadslQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in query_gadsl endpoint: {str(e)}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred during the GADSL query. Please check the server logs."}), 500
+
+    if output_format == "csv":
+        def generate():
+            rows = io.StringIO()
+            writer = csv.DictWriter(rows, fieldnames=GADSL_FIELDS)
+            writer.writeheader()
+            for entry in page["entries"]:
+                writer.writerow(entry)
+                if rows.tell() >= 64 * 1024: # Send in chunks rather than a write per row
+                    yield rows.getvalue()
+                    rows.seek(0)
+                    rows.truncate()
+            yield rows.getvalue()
+        response = Response(stream_with_context(generate()), mimetype="text/csv")
+        response.headers["Content-Disposition"] = "attachment; filename=gadsl_query.csv"
+    else:
+        def generate():
+            head = {"gadsl_version": dataset.version[:16], "total": page["total"], "next_cursor": page["next_cursor"]}
+            yield json.dumps(head)[:-1] + ', "results": ['
+            separator = ""
+            for entry in page["entries"]:
+                yield separator + json.dumps(entry)
+                separator = ", "
+            yield "]}\n"
+        response = Response(stream_with_context(generate()), mimetype="application/json")
+
+    # Paging details also travel in headers, so CSV clients can follow them
+    response.headers["X-Total-Count"] = str(page["total"])
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = str(page["next_cursor"])
+    return response
+
+# Shared validation of the "msds_pdf" upload field; returns (file, None) or (None, error response)
+def _get_uploaded_pdf():
+    if "msds_pdf" not in request.files:
+        return None, (jsonify({"error": "No PDF file provided in the request."}), 400)
+
+    pdf_file = request.files["msds_pdf"]
+    if not pdf_file.filename or not pdf_file.filename.lower().endswith('.pdf'):
+        return None, (jsonify({"error": "Invalid file type. Only PDF files are allowed and a filename is required."}), 400)
+    return pdf_file, None
+
+# Optional form field: stop reading (and OCR'ing) pages once SECTION 4 has been reached
+def _get_stop_at_section_4_option():
+    stop_at_section_4 = request.form.get("stop_at_section_4")
+    if stop_at_section_4 is None:
+        return STOP_AT_SECTION_4
+    return stop_at_section_4.lower() in ("1", "true", "yes")
+
 # API endpoint for uploading and processing MSDS PDFs
 @app.route("/upload_msds_pdf", methods=["POST"])
 def upload_msds_pdf():
@@ -106,15 +407,15 @@ def upload_msds_pdf():
             logger.error("Attempted PDF upload, but GADSL data was not loaded.")
             return jsonify({"error": "Server data not ready. Please try again later (GADSL data failed to load)."}), 503
 
-        if "msds_pdf" not in request.files:
-            return jsonify({"error": "No PDF file provided in the request."}), 400
-
-        pdf_file = request.files["msds_pdf"]
-        if not pdf_file.filename or not pdf_file.filename.lower().endswith('.pdf'):
-            return jsonify({"error": "Invalid file type. Only PDF files are allowed and a filename is required."}), 400
+        pdf_file, error_response = _get_uploaded_pdf()
+        if error_response:
+            return error_response
 
         # Pass the FileStorage object directly, it behaves like a file stream
-        results = process_msds_pdf_for_gadsl_matches(pdf_file)
+        results = process_msds_pdf_for_gadsl_matches(
+            pdf_file, stop_at_section_4=_get_stop_at_section_4_option(), dataset=g.gadsl_dataset,
+            document_name=pdf_file.filename, screening_index=get_screening_index()
+        )
 
         # Always return a list of results, even if empty, for consistency
         return jsonify({"results": results if results else []})
@@ -126,6 +427,147 @@ def upload_msds_pdf():
         logger.error(f"Error in upload_msds_pdf endpoint: {str(e)}", exc_info=True)
         return jsonify({"error": f"Failed to process PDF: {str(e)}. Please try another file or format. Check server logs for details."}), 500
 
+# --- Asynchronous MSDS jobs ---
+# POST /msds_jobs queues a PDF and answers 202 with a job id straight away; clients then poll
+# GET /msds_jobs/<id> for status and per-stage progress, and fetch GET /msds_jobs/<id>/result.
+def _run_msds_job(pdf_bytes, options, progress):
+    dataset = get_gadsl_dataset() # The list active when the job starts is used for the whole job
+    results = process_msds_pdf_for_gadsl_matches(
+        io.BytesIO(pdf_bytes), stop_at_section_4=options["stop_at_section_4"], progress=progress, dataset=dataset,
+        document_name=options.get("filename"), screening_index=get_screening_index()
+    )
+    return {"results": results if results else [], "gadsl_version": dataset.version[:16]}
+
+_msds_job_queue = MsdsJobQueue(
+    _run_msds_job,
+    state_dir=MSDS_JOB_DIR,
+    max_workers=MSDS_JOB_WORKERS,
+    max_queued=MSDS_JOB_QUEUE_SIZE,
+    job_ttl_seconds=MSDS_JOB_TTL_SECONDS,
+)
+
+@app.route("/msds_jobs", methods=["POST"])
+def submit_msds_job():
+    try:
+        if get_gadsl_data_by_cas() is None:
+            logger.error("Attempted MSDS job submission, but GADSL data was not loaded.")
+            return jsonify({"error": "Server data not ready. Please try again later (GADSL data failed to load)."}), 503
+
+        pdf_file, error_response = _get_uploaded_pdf()
+        if error_response:
+            return error_response
+
+        options = {"stop_at_section_4": _get_stop_at_section_4_option(), "filename": pdf_file.filename}
+        job_id = _msds_job_queue.submit(pdf_file.read(), pdf_file.filename, options)
+    except QueueFullError as e:
+        # Backpressure: tell the client to come back later instead of queueing without bound
+        logger.warning(f"Rejected MSDS job: {str(e)}")
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+    except Exception as e:
+        logger.error(f"Error in submit_msds_job endpoint: {str(e)}", exc_info=True)
+        return jsonify({"error": "An internal server error occurred while queueing the PDF. Please check the server logs."}), 500
+
+    status_url = url_for("msds_job_status", job_id=job_id)
+    response = jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": status_url,
+        "result_url": url_for("msds_job_result", job_id=job_id),
+    })
+    response.headers["Location"] = status_url
+    return response, 202
+
+@app.route("/msds_jobs/<job_id>", methods=["GET"])
+def msds_job_status(job_id):
+    state = _msds_job_queue.get(job_id)
+    if state is None:
+        return jsonify({"error": "Unknown or expired job ID."}), 404
+    state.pop("result", None) # Status polls stay small; the result has its own endpoint
+    return jsonify(state)
+
+@app.route("/msds_jobs/<job_id>/result", methods=["GET"])
+def msds_job_result(job_id):
+    state = _msds_job_queue.get(job_id)
+    if state is None:
+        return jsonify({"error": "Unknown or expired job ID."}), 404
+    if state["status"] == "failed":
+        return jsonify({"error": f"Failed to process PDF: {state['error']}. Please try another file or format."}), 500
+    if state["status"] != "done":
+        state.pop("result", None)
+        return jsonify(state), 202 # Not finished yet
+    return jsonify(state["result"])
+
+# Hit/miss counters of the MSDS result cache (per worker process)
+@app.route("/msds_cache_stats", methods=["GET"])
+def msds_cache_stats():
+    return jsonify(get_msds_cache_stats())
+
+# Prometheus scrape endpoint: latency histograms, counters and gauges of this worker process
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    for stat, value in get_msds_cache_stats().items():
+        if value is not None:
+            MSDS_CACHE_STATS.set(value, stat=stat)
+    job_stats = _msds_job_queue.stats()
+    MSDS_JOB_QUEUE.set(job_stats["queued"], state="queued")
+    MSDS_JOB_QUEUE.set(job_stats["running"], state="running")
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+# --- Admin: reloading a new GADSL revision without a restart ---
+# The new list is built in the background while the current one keeps serving, then swapped in
+# atomically. The receiving worker rebuilds the shared snapshot; the others map it on their next poll. Requires the X-Admin-Token header to match CHEMSURE_ADMIN_TOKEN.
+def _check_admin_token():
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled (CHEMSURE_ADMIN_TOKEN is not set)."}), 404
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        return jsonify({"error": "Invalid or missing admin token."}), 403
+    return None
+
+@app.route("/admin/reload_gadsl", methods=["POST"])
+def admin_reload_gadsl():
+    error_response = _check_admin_token()
+    if error_response:
+        return error_response
+
+    # ?wait=1 blocks until the new list is active (or the reload failed); otherwise answer 202 right away
+    if request.args.get("wait", "").lower() in ("1", "true", "yes"):
+        try:
+            reloaded = reload_gadsl_data()
+        except Exception as e:
+            return jsonify({"error": f"GADSL reload failed, still serving the previous version: {str(e)}",
+                            "status": get_gadsl_reload_status()}), 500
+        return jsonify({"reloaded": reloaded, "status": get_gadsl_reload_status()})
+
+    started = start_gadsl_reload()
+    return jsonify({"started": started, "status": get_gadsl_reload_status()}), 202
+
+@app.route("/admin/gadsl_status", methods=["GET"])
+def admin_gadsl_status():
+    error_response = _check_admin_token()
+    if error_response:
+        return error_response
+    return jsonify(get_gadsl_reload_status())
+
+# --- Re-screening reports ---
+# When a new GADSL revision is loaded, stored documents affected by the changes are matched
+# again from their stored text; each version change produces a report of the documents whose
+# results changed.
+@app.route("/rescreening_reports", methods=["GET"])
+def rescreening_reports():
+    reports = get_rescreening_reports(limit=max(1, min(request.args.get("limit", 20, type=int) or 20, 100)))
+    if reports is None:
+        return jsonify({"error": "The MSDS screening index is disabled on this server."}), 404
+    return jsonify({"reports": reports})
+
+@app.route("/rescreening_reports/<int:report_id>", methods=["GET"])
+def rescreening_report(report_id):
+    report = get_rescreening_report(report_id)
+    if report is None:
+        return jsonify({"error": "Unknown re-screening report, or the MSDS screening index is disabled."}), 404
+    return jsonify(report)
+
 # Entry point for running the Flask app
 if __name__ == "__main__":
     # Get host and port from environment variables or use defaults
@@ -0,0 +1,209 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Latency histograms, counters and per-request stage timings ---
+# Metrics live in the memory of each worker process and are rendered in the Prometheus text
+# format by GET /metrics. Every stage timed with `time_stage()` is also collected for the
+# request being served (if any), which the server reports back in a Server-Timing header.
+
+# Histogram buckets in seconds, from sub-millisecond lookups up to multi-minute OCR jobs
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _label_value(value):
+    return ("true" if value else "false") if isinstance(value, bool) else str(value)
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {} # label values tuple -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(_label_value(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (requests, pages, bytes)."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down (entries loaded, last load time)."""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, for tail latency (p95/p99) queries."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0] # bucket counts, sum, count
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for label_values, (bucket_counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.label_names, label_values, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, label_values, [("le", "+Inf")])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """All metrics of this process, rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "chemsure_stage_duration_seconds", "Time spent per processing stage.", ["stage"]
+)
+PDF_PAGES = REGISTRY.counter(
+    "chemsure_pdf_pages_total", "PDF pages read, by how their text was obtained.", ["method"]
+)
+PDF_BYTES = REGISTRY.counter(
+    "chemsure_pdf_bytes_processed_total", "Bytes of uploaded PDFs processed (cache hits included)."
+)
+MSDS_DOCUMENTS = REGISTRY.counter(
+    "chemsure_msds_documents_total", "MSDS PDFs processed, by outcome.", ["outcome"]
+)
+LOOKUPS = REGISTRY.counter(
+    "chemsure_lookups_total", "GADSL lookups, by kind and whether they matched.", ["kind", "matched"]
+)
+GADSL_LOAD_SECONDS = REGISTRY.gauge(
+    "chemsure_gadsl_load_seconds", "Duration of the last GADSL data load or reload."
+)
+GADSL_ENTRIES = REGISTRY.gauge(
+    "chemsure_gadsl_entries", "Entries in the active GADSL dataset, by index.", ["index"]
+)
+MSDS_CACHE_STATS = REGISTRY.gauge(
+    "chemsure_msds_cache", "MSDS result cache counters and sizes of this worker, by statistic.", ["stat"]
+)
+MSDS_JOB_QUEUE = REGISTRY.gauge(
+    "chemsure_msds_jobs", "Background MSDS jobs of this worker, by state.", ["state"]
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "chemsure_http_request_duration_seconds", "Time to produce a response (streamed bodies excluded).",
+    ["endpoint", "method", "status"]
+)
+
+# Stage timings of the request being served in this context; None outside of requests
+_request_timings = contextvars.ContextVar("chemsure_request_timings", default=None)
+
+
+def start_request_timings():
+    """Start collecting stage timings for the current request."""
+    _request_timings.set({})
+
+
+def get_request_timings():
+    """Stage -> total seconds recorded so far for the current request (empty outside of requests)."""
+    return dict(_request_timings.get() or {})
+
+
+def record_stage(stage, seconds):
+    """Record a stage duration that was measured elsewhere (e.g. in an OCR worker process)."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def time_stage(stage):
+    """Time the enclosed block as `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def format_server_timing(timings, total_seconds=None):
+    """Server-Timing header value ("stage;dur=<ms>, ...") for the given stage timings."""
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    if total_seconds is not None:
+        entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
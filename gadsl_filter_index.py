@@ -0,0 +1,166 @@
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+# --- Bitmap indexes for filtering and exporting the GADSL list ---
+# Every filterable value has a bitmap of the rows that carry it: a Python int whose bit i is set
+# when row i does. A query ORs the bitmaps of the values it accepts for each field and ANDs
+# the fields together, so "Prohibited, Legally Regulated, revised since 2024" costs a few big-int
+# operations over ~7,000 bits instead of a pass over every entry.
+#
+# classification ("D/P") and reason_code ("FI/LR") cells are split into their codes, so a
+# query for P finds D/P entries too. Source cells can list several regulations, one per line;
+# each line is indexed and matched case-insensitively by substring. first_added and
+# last_revised are indexed by day, with cumulative bitmaps so any date range is one AND-NOT.
+
+# Fields split into codes, and the separator between codes in a cell
+_CODE_FIELDS = {"classification": "/", "reason_code": "/"}
+DATE_FIELDS = ("first_added", "last_revised")
+_DATE_PATTERN = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
+# Query arguments: (field, bound) of every date range argument
+DATE_RANGE_ARGUMENTS = {
+    "added_since": ("first_added", "since"), "added_until": ("first_added", "until"),
+    "revised_since": ("last_revised", "since"), "revised_until": ("last_revised", "until"),
+}
+
+
+class GadslQueryError(ValueError):
+    """Raised when a filter query cannot be interpreted."""
+
+
+def _parse_date(value):
+    """Date at the start of a GADSL date cell ("2024-02-01 00:00:00") or query argument, or None."""
+    match = _DATE_PATTERN.match(value.strip())
+    if match is None:
+        return None
+    try:
+        return date(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+
+def iter_bits(bitmap):
+    """Row ids whose bit is set, in increasing order."""
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+class GadslFilterIndex:
+    """Bitmap indexes over classification, reason code, source and the revision dates of a snapshot."""
+
+    def __init__(self, snapshot):
+        self.row_count = snapshot.row_count
+        self.all_rows = (1 << self.row_count) - 1
+        self._codes = {field: {} for field in _CODE_FIELDS} # field -> code -> bitmap
+        self._sources = {} # source line (lowercased) -> bitmap
+        dates = {field: {} for field in DATE_FIELDS} # field -> date -> bitmap
+
+        for row_id in range(self.row_count):
+            bit = 1 << row_id
+            for field, separator in _CODE_FIELDS.items():
+                cell = snapshot.cell(row_id, field).upper()
+                if cell == "N/A":
+                    continue
+                for code in cell.split(separator):
+                    code = code.strip()
+                    if code:
+                        self._codes[field][code] = self._codes[field].get(code, 0) | bit
+            for line in snapshot.cell(row_id, "source").lower().splitlines():
+                line = line.strip()
+                if line and line != "n/a":
+                    self._sources[line] = self._sources.get(line, 0) | bit
+            for field in DATE_FIELDS:
+                day = _parse_date(snapshot.cell(row_id, field))
+                if day is not None:
+                    dates[field][day] = dates[field].get(day, 0) | bit
+
+        # Per date field: the distinct days, sorted, and cumulative[i] = rows dated before days[i]
+        self._dates = {}
+        for field, bitmaps in dates.items():
+            days = sorted(bitmaps)
+            cumulative = [0]
+            for day in days:
+                cumulative.append(cumulative[-1] | bitmaps[day])
+            self._dates[field] = (days, cumulative)
+
+    def codes(self, field):
+        """The codes a query can filter `field` on, e.g. ["D", "P"] for classification."""
+        return sorted(self._codes[field])
+
+    def code_rows(self, field, codes):
+        """Rows carrying any of `codes` in `field`."""
+        bitmap = 0
+        known = self._codes[field]
+        for code in codes:
+            code = code.strip().upper()
+            if code not in known:
+                raise GadslQueryError(f"Unknown {field} '{code}'. Known values: {', '.join(self.codes(field))}.")
+            bitmap |= known[code]
+        return bitmap
+
+    def source_rows(self, text):
+        """Rows with a source line containing `text` (case-insensitive)."""
+        text = text.strip().lower()
+        bitmap = 0
+        for line, rows in self._sources.items(): # A few hundred distinct lines, not one per row
+            if text in line:
+                bitmap |= rows
+        return bitmap
+
+    def date_rows(self, field, since=None, until=None):
+        """Rows whose `field` date is within [since, until]; rows without a date never match."""
+        days, cumulative = self._dates[field]
+        low = bisect_left(days, since) if since else 0
+        high = bisect_right(days, until) if until else len(days)
+        if low >= high:
+            return 0
+        return cumulative[high] & ~cumulative[low]
+
+    def query(self, classification=(), reason_code=(), source=None, date_ranges=None):
+        """Bitmap of the rows matching every given filter (all rows when none is given).
+
+        Values of one filter are alternatives (classification=["D", "P"] is D or P); filters
+        are combined with AND. `date_ranges` maps a date field to a (since, until) pair.
+        """
+        bitmap = self.all_rows
+        if classification:
+            bitmap &= self.code_rows("classification", classification)
+        if reason_code:
+            bitmap &= self.code_rows("reason_code", reason_code)
+        if source:
+            bitmap &= self.source_rows(source)
+        for field, (since, until) in (date_ranges or {}).items():
+            bitmap &= self.date_rows(field, since, until)
+        return bitmap
+
+
+def parse_query_arguments(arguments):
+    """Keyword arguments for GadslFilterIndex.query() from request arguments (name -> list of strings).
+
+    classification and reason_code accept repeated and/or comma-separated codes; dates are
+    YYYY-MM-DD and inclusive.
+    """
+    def values(name):
+        return [value for raw in arguments.get(name, []) for value in raw.split(",") if value.strip()]
+
+    date_ranges = {}
+    for name, (field, bound) in DATE_RANGE_ARGUMENTS.items():
+        raw = (arguments.get(name) or [""])[-1]
+        if not raw.strip():
+            continue
+        day = _parse_date(raw)
+        if day is None or raw.strip() != day.isoformat():
+            raise GadslQueryError(f"'{name}' must be a date in YYYY-MM-DD format.")
+        since, until = date_ranges.get(field, (None, None))
+        date_ranges[field] = (day, until) if bound == "since" else (since, day)
+
+    source = (arguments.get("source") or [""])[-1].strip()
+    return {
+        "classification": values("classification"),
+        "reason_code": values("reason_code"),
+        "source": source or None,
+        "date_ranges": date_ranges,
+    }
@@ -0,0 +1,412 @@
+import argparse
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Mapping, Sequence
+
+logger = logging.getLogger(__name__)
+
+# --- Binary snapshot of the GADSL reference list ---
+# Reading the Excel workbook with pandas takes seconds per process. The snapshot is a
+# compact, read-only binary image of the same rows. Workers don't copy it into Python
+# objects: they mmap the file and decode cells on access, so every worker process on a host
+# shares the same page-cache pages and per-worker memory stays flat as workers are added.
+#
+# Besides rows and key indexes, a snapshot carries named arrays: the tables of the structures
+# built from the list (the name scanner, the search index, ...), so they are computed once by
+# whoever writes the snapshot and shared by every worker instead of being rebuilt per process.
+#
+# Layout (all integers little-endian):
+#   header   : magic, format version, field count, source SHA-256, payload SHA-256,
+#              row count, string count, string blob length, index count, array count
+#   payload  : string offsets  u32[string_count + 1]
+#              row cells       u32[row_count * field_count]  (ids into the string table)
+#              index table     u32[index_count * 4]          (name string id, key count, row id count, multi-valued)
+#              per index       u32[key_count] key string ids, sorted by key
+#                              multi-valued only: u32[key_count + 1] start of each key's row ids
+#                              u32[row_id_count] row ids, in key order
+#              array table     u32[array_count * 3]          (name string id, length, holds string ids)
+#              per array       u32[length] values, or ids into the string table
+#              string blob     UTF-8 bytes
+# Every distinct string is stored once. The first `field_count` strings are the field names,
+# so a snapshot built for a different column layout is rejected instead of being misread.
+
+SNAPSHOT_MAGIC = b"GADSLSNP"
+SNAPSHOT_FORMAT_VERSION = 4
+_HEADER = struct.Struct("<8sHH32s32sIIIII")
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, stale, corrupt or of another format."""
+
+
+def compute_file_sha256(path):
+    """Returns the hex SHA-256 of a file, used to key the snapshot on its Excel source."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _u32_array(buffer, offset, count):
+    """Returns the `count` little-endian u32 values at `offset` as an indexable sequence."""
+    view = memoryview(buffer)[offset:offset + 4 * count]
+    if sys.byteorder == "little":
+        return view.cast("I") # Zero-copy view over the mapped file
+    values = array("I", view.tobytes())
+    values.byteswap()
+    return values
+
+
+def write_snapshot(rows, fields, source_sha256, snapshot_path, indexes=None, arrays=None):
+    """Serialize `rows` (dicts keyed by `fields`) into a snapshot file, atomically.
+
+    `indexes` maps an index name to a {key: row id} dict, or to a {key: [row ids]} dict for an
+    index where one key can have several rows; each is stored sorted by key so readers can
+    binary-search it in place. `arrays` maps a name to a sequence of u32 values or of strings.
+    """
+    indexes = indexes or {}
+    arrays = arrays or {}
+    string_ids = {}
+    strings = []
+
+    def intern(value):
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = string_ids[value] = len(strings)
+            strings.append(value)
+        return string_id
+
+    for field in fields:
+        intern(field)
+    cells = array("I", (intern(row[field]) for row in rows for field in fields))
+
+    index_table = array("I")
+    index_entries = array("I")
+    for name, entries in indexes.items():
+        keys = sorted(entries)
+        multi_valued = any(isinstance(value, (list, tuple)) for value in entries.values())
+        if multi_valued:
+            row_ids = [list(entries[key]) if isinstance(entries[key], (list, tuple)) else [entries[key]] for key in keys]
+        else:
+            row_ids = [[entries[key]] for key in keys]
+        index_table.extend((intern(name), len(keys), sum(map(len, row_ids)), int(multi_valued)))
+        index_entries.extend(intern(key) for key in keys)
+        if multi_valued:
+            start = 0
+            index_entries.append(start)
+            for ids in row_ids:
+                start += len(ids)
+                index_entries.append(start)
+        for ids in row_ids:
+            index_entries.extend(ids)
+
+    array_table = array("I")
+    array_values = array("I")
+    for name, values in arrays.items():
+        holds_strings = any(isinstance(value, str) for value in values)
+        array_table.extend((intern(name), len(values), int(holds_strings)))
+        array_values.extend(map(intern, values) if holds_strings else values)
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    blob = b"".join(encoded)
+
+    if sys.byteorder != "little":
+        for values in (offsets, cells, index_table, index_entries, array_table, array_values):
+            values.byteswap()
+    payload = (offsets.tobytes() + cells.tobytes() + index_table.tobytes() + index_entries.tobytes()
+               + array_table.tobytes() + array_values.tobytes() + blob)
+
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(fields),
+        bytes.fromhex(source_sha256), hashlib.sha256(payload).digest(),
+        len(rows), len(strings), len(blob), len(indexes), len(arrays)
+    )
+
+    # Write to a temporary file and rename so concurrent workers never see a partial snapshot
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".gadsl-snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(payload)
+        os.replace(tmp_path, snapshot_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    logger.info(f"GADSL snapshot written to {snapshot_path} ({len(rows)} rows, {len(header) + len(payload)} bytes).")
+
+
+class GadslSnapshot:
+    """Read-only, memory-mapped view of a snapshot: rows by integer id plus its sorted key indexes."""
+
+    def __init__(self, buffer, fields, row_count, offsets, cells, indexes, arrays, blob, blob_pos):
+        # The mapping stays open for as long as any view into it is alive; it is never closed
+        # explicitly, because requests may still hold rows of a dataset that was reloaded
+        self._buffer = buffer
+        self.fields = tuple(fields)
+        self.row_count = row_count
+        self._field_positions = {field: i for i, field in enumerate(fields)}
+        self._offsets = offsets
+        self._cells = cells
+        self._indexes = indexes # index name -> (key string ids, row id starts or None, row ids)
+        self._arrays = arrays # array name -> (u32 values, holds string ids)
+        self._blob = blob
+        self._blob_pos = blob_pos
+
+    def string_bytes(self, string_id):
+        """UTF-8 bytes of a string, without decoding it (UTF-8 byte order is code point order)."""
+        position = self._blob_pos
+        return self._buffer[position + self._offsets[string_id]:position + self._offsets[string_id + 1]]
+
+    def string(self, string_id):
+        return str(self._blob[self._offsets[string_id]:self._offsets[string_id + 1]], "utf-8")
+
+    def cell(self, row_id, field):
+        """Value of one field of a row."""
+        return self.string(self._cells[row_id * len(self.fields) + self._field_positions[field]])
+
+    def row(self, row_id):
+        """A fresh dict of the row's fields (callers may keep or modify it)."""
+        base = row_id * len(self.fields)
+        return {field: self.string(self._cells[base + i]) for i, field in enumerate(self.fields)}
+
+    def iter_rows(self):
+        for row_id in range(self.row_count):
+            yield self.row(row_id)
+
+    def array(self, name):
+        """A named array: a zero-copy u32 sequence, or a SnapshotStrings for an array of strings."""
+        if name not in self._arrays:
+            raise SnapshotError(f"snapshot has no array named {name!r}")
+        values, holds_strings = self._arrays[name]
+        return SnapshotStrings(self, values) if holds_strings else values
+
+    def arrays(self, prefix):
+        """{name: array} of every array named "<prefix>.<name>", e.g. the tables of one structure."""
+        start = prefix + "."
+        return {name[len(start):]: self.array(name) for name in self._arrays if name.startswith(start)}
+
+    def index(self, name):
+        """Read-only mapping of the named index: key -> row dict (key -> list of row dicts if multi-valued)."""
+        if name not in self._indexes:
+            raise SnapshotError(f"snapshot has no index named {name!r}")
+        key_ids, starts, row_ids = self._indexes[name]
+        if starts is None:
+            return SnapshotIndex(self, key_ids, row_ids)
+        return SnapshotMultiIndex(self, key_ids, starts, row_ids)
+
+
+class SnapshotStrings(Sequence):
+    """Read-only sequence of strings stored in a snapshot as string ids, decoded on access."""
+
+    def __init__(self, snapshot, string_ids):
+        self._snapshot = snapshot
+        self._string_ids = string_ids
+        self._offsets = snapshot._offsets
+        self._blob = snapshot._blob
+
+    def __len__(self):
+        return len(self._string_ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._snapshot.string(string_id) for string_id in self._string_ids[position]]
+        # Inlined snapshot.string(): bisect calls this once per step
+        string_id = self._string_ids[position]
+        return str(self._blob[self._offsets[string_id]:self._offsets[string_id + 1]], "utf-8")
+
+    def encoded(self, position):
+        """UTF-8 bytes of one string, sliced from the mapping without decoding it."""
+        return self._snapshot.string_bytes(self._string_ids[position])
+
+
+class _SortedKeyIndex(Mapping):
+    """Sorted keys inside a snapshot, looked up by binary search over the mapping."""
+
+    def __init__(self, snapshot, key_ids):
+        self._snapshot = snapshot
+        self._key_ids = key_ids
+
+    def _position(self, key):
+        """Position of `key` among the sorted keys, or None."""
+        string_bytes = self._snapshot.string_bytes
+        key = key.encode("utf-8")
+        low, high = 0, len(self._key_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if string_bytes(self._key_ids[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._key_ids) and string_bytes(self._key_ids[low]) == key:
+            return low
+        return None
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self._position(key) is not None
+
+    def __len__(self):
+        return len(self._key_ids)
+
+    def __iter__(self):
+        string = self._snapshot.string
+        return (string(key_id) for key_id in self._key_ids)
+
+
+class SnapshotIndex(_SortedKeyIndex):
+    """Sorted key -> row id index inside a snapshot."""
+
+    def __init__(self, snapshot, key_ids, row_ids):
+        super().__init__(snapshot, key_ids)
+        self._row_ids = row_ids
+
+    def row_id(self, key):
+        """Row id of `key`, or None."""
+        position = self._position(key)
+        return None if position is None else self._row_ids[position]
+
+    def __getitem__(self, key):
+        row_id = self.row_id(key) if isinstance(key, str) else None
+        if row_id is None:
+            raise KeyError(key)
+        return self._snapshot.row(row_id)
+
+    def iter_row_ids(self):
+        """(key, row id) pairs in key order, without materializing the rows."""
+        string = self._snapshot.string
+        for key_id, row_id in zip(self._key_ids, self._row_ids):
+            yield string(key_id), row_id
+
+
+class SnapshotMultiIndex(_SortedKeyIndex):
+    """Sorted key -> row ids index inside a snapshot, for keys shared by several rows."""
+
+    def __init__(self, snapshot, key_ids, starts, row_ids):
+        super().__init__(snapshot, key_ids)
+        self._starts = starts
+        self._row_ids = row_ids
+
+    def row_ids(self, key):
+        """Row ids of `key` in row order (empty if the key is not indexed)."""
+        position = self._position(key)
+        if position is None:
+            return []
+        return list(self._row_ids[self._starts[position]:self._starts[position + 1]])
+
+    def __getitem__(self, key):
+        row_ids = self.row_ids(key) if isinstance(key, str) else []
+        if not row_ids:
+            raise KeyError(key)
+        return [self._snapshot.row(row_id) for row_id in row_ids]
+
+    def iter_row_ids(self):
+        """(key, row ids) pairs in key order, without materializing the rows."""
+        string = self._snapshot.string
+        for position, key_id in enumerate(self._key_ids):
+            yield string(key_id), list(self._row_ids[self._starts[position]:self._starts[position + 1]])
+
+
+def read_snapshot_source(snapshot_path):
+    """SHA-256 of the source file a snapshot was built from, read from its header alone; None if unreadable."""
+    try:
+        with open(snapshot_path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+    magic, format_version, _, source_digest = _HEADER.unpack(header)[:4]
+    if magic != SNAPSHOT_MAGIC or format_version != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return source_digest.hex()
+
+
+def open_snapshot(snapshot_path, fields, source_sha256):
+    """Map a snapshot, raising SnapshotError unless it matches `fields` and `source_sha256`."""
+    try:
+        with open(snapshot_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise SnapshotError("snapshot is truncated")
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        raise SnapshotError(f"no snapshot at {snapshot_path}")
+
+    (magic, format_version, field_count, source_digest, payload_digest,
+     row_count, string_count, blob_len, index_count, array_count) = _HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC or format_version != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError("snapshot has an unknown format version")
+    if source_digest.hex() != source_sha256:
+        raise SnapshotError("snapshot was built from a different GADSL source file")
+
+    offsets_pos = _HEADER.size
+    cells_pos = offsets_pos + 4 * (string_count + 1)
+    index_table_pos = cells_pos + 4 * row_count * field_count
+    if len(buffer) < index_table_pos + 16 * index_count:
+        raise SnapshotError("snapshot size does not match its header")
+    index_table = _u32_array(buffer, index_table_pos, 4 * index_count)
+    index_table = [tuple(index_table[4 * i:4 * i + 4]) for i in range(index_count)]
+    # Keys, row ids, and for multi-valued indexes the start of every key's row ids
+    index_entry_count = sum(key_count + row_id_count + (key_count + 1 if multi_valued else 0)
+                            for _, key_count, row_id_count, multi_valued in index_table)
+    array_table_pos = index_table_pos + 16 * index_count + 4 * index_entry_count
+    if len(buffer) < array_table_pos + 12 * array_count:
+        raise SnapshotError("snapshot size does not match its header")
+    array_table = _u32_array(buffer, array_table_pos, 3 * array_count)
+    array_table = [tuple(array_table[3 * i:3 * i + 3]) for i in range(array_count)]
+    blob_pos = array_table_pos + 12 * array_count + 4 * sum(length for _, length, _ in array_table)
+    if len(buffer) != blob_pos + blob_len:
+        raise SnapshotError("snapshot size does not match its header")
+    if hashlib.sha256(memoryview(buffer)[offsets_pos:]).digest() != payload_digest:
+        raise SnapshotError("snapshot checksum mismatch")
+
+    offsets = _u32_array(buffer, offsets_pos, string_count + 1)
+    blob = memoryview(buffer)[blob_pos:]
+    snapshot = GadslSnapshot(buffer, fields, row_count, offsets,
+                             _u32_array(buffer, cells_pos, row_count * field_count), {}, {}, blob, blob_pos)
+    if [snapshot.string(i) for i in range(field_count)] != list(fields):
+        raise SnapshotError("snapshot fields do not match the expected GADSL columns")
+
+    position = index_table_pos + 16 * index_count
+    for name_id, key_count, row_id_count, multi_valued in index_table:
+        key_ids = _u32_array(buffer, position, key_count)
+        position += 4 * key_count
+        starts = None
+        if multi_valued:
+            starts = _u32_array(buffer, position, key_count + 1)
+            position += 4 * (key_count + 1)
+        row_ids = _u32_array(buffer, position, row_id_count)
+        position += 4 * row_id_count
+        snapshot._indexes[snapshot.string(name_id)] = (key_ids, starts, row_ids)
+
+    position = array_table_pos + 12 * array_count
+    for name_id, length, holds_strings in array_table:
+        snapshot._arrays[snapshot.string(name_id)] = (_u32_array(buffer, position, length), bool(holds_strings))
+        position += 4 * length
+    return snapshot
+
+
+def main(argv=None):
+    """Build step: `python gadsl_snapshot.py` regenerates the snapshot next to the Excel file."""
+    import backend_gadsl_lookup_api as backend
+
+    parser = argparse.ArgumentParser(description="Build the binary GADSL snapshot from the Excel reference list.")
+    parser.add_argument("--source", default=backend.GADSL_FILE_PATH, help="Path to the GADSL Excel file.")
+    parser.add_argument("--output", default=backend.GADSL_SNAPSHOT_PATH, help="Where to write the snapshot.")
+    args = parser.parse_args(argv)
+
+    backend.build_gadsl_snapshot(args.source, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+# Gunicorn settings for production: `gunicorn -c gunicorn.conf.py chemsure_api_server:app`
+import os
+
+bind = f"{os.environ.get('FLASK_HOST', '0.0.0.0')}:{os.environ.get('FLASK_PORT', 5000)}"
+workers = int(os.environ.get("GUNICORN_WORKERS", os.cpu_count() or 1))
+# Inherited by the workers: each sizes its OCR pool to its share of the cores (see msds_ocr.py)
+os.environ["CHEMSURE_WEB_WORKERS"] = str(workers)
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120)) # Large scanned PDFs can take a while to OCR
+
+
+def on_starting(server):
+    """Build the GADSL snapshot once in the master, so workers only map the shared file."""
+    from backend_gadsl_lookup_api import ensure_gadsl_snapshot
+
+    ensure_gadsl_snapshot()
@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# --- Asynchronous MSDS processing jobs ---
+# Slow (scanned) PDFs are processed by a small, separately sized pool of background threads
+# instead of the request handler, so they can't starve cheap lookups of web workers. The
+# number of waiting jobs is bounded: when the queue is full, submissions are rejected right
+# away (the client should retry later) rather than piling up.
+# Job state is written to a directory shared by all web worker processes, so a client can
+# poll any worker for a job that another worker is running.
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_DONE = "done"
+JOB_STATUS_FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class MsdsJobQueue:
+    """Bounded queue of MSDS jobs with a fixed number of worker threads."""
+
+    def __init__(self, process_func, state_dir, max_workers=2, max_queued=16, job_ttl_seconds=3600):
+        """`process_func(pdf_bytes, options, progress)` returns the job result; `progress(stage, **details)` reports progress."""
+        self.process_func = process_func
+        self.state_dir = state_dir
+        self.max_workers = max_workers
+        self.job_ttl_seconds = job_ttl_seconds
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {} # job_id -> state of the jobs owned by this process
+        self._lock = threading.Lock()
+        self._workers = []
+        self._last_cleanup = 0.0
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _ensure_workers(self):
+        # Started lazily, so importing the server (e.g. before a fork) doesn't start threads
+        with self._lock:
+            if not self._workers:
+                for i in range(self.max_workers):
+                    worker = threading.Thread(target=self._work, name=f"msds-job-worker-{i}", daemon=True)
+                    worker.start()
+                    self._workers.append(worker)
+
+    def submit(self, pdf_bytes, filename, options=None):
+        """Queue a document and return its job id, or raise QueueFullError."""
+        self._ensure_workers()
+        self._cleanup_expired()
+
+        job_id = uuid.uuid4().hex
+        state = {
+            "job_id": job_id,
+            "status": JOB_STATUS_QUEUED,
+            "filename": filename,
+            "stage": "queued",
+            "progress": {},
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        with self._lock:
+            try:
+                self._queue.put_nowait((job_id, pdf_bytes, options or {}))
+            except queue.Full:
+                raise QueueFullError("MSDS job queue is full, please retry later.")
+            self._jobs[job_id] = state
+        self._save(state)
+        logger.info(f"Queued MSDS job {job_id} ({filename}); {self._queue.qsize()} job(s) waiting.")
+        return job_id
+
+    def get(self, job_id):
+        """Returns the state of a job (result included once done), or None if unknown/expired."""
+        if not all(c in "0123456789abcdef" for c in job_id):
+            return None # Never let a job id turn into a path outside the state directory
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is not None:
+                return dict(state)
+        try:
+            with open(self._state_path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def stats(self):
+        """Queue depth and capacity, for monitoring and admission decisions."""
+        with self._lock:
+            running = sum(1 for state in self._jobs.values() if state["status"] == JOB_STATUS_RUNNING)
+        return {"queued": self._queue.qsize(), "running": running,
+                "max_queued": self._queue.maxsize, "max_workers": self.max_workers}
+
+    def _work(self):
+        while True:
+            job_id, pdf_bytes, options = self._queue.get()
+            try:
+                self._run(job_id, pdf_bytes, options)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id, pdf_bytes, options):
+        self._update(job_id, status=JOB_STATUS_RUNNING, stage="started", started_at=time.time())
+        last_saved = [0.0]
+
+        def progress(stage, **details):
+            with self._lock:
+                state = self._jobs[job_id]
+                state["stage"] = stage
+                state["progress"] = details
+            # Progress is persisted at most every half second; final states are always saved
+            now = time.monotonic()
+            if now - last_saved[0] >= 0.5:
+                last_saved[0] = now
+                self._save(state)
+
+        try:
+            result = self.process_func(pdf_bytes, options, progress)
+            self._update(job_id, status=JOB_STATUS_DONE, stage="done", finished_at=time.time(), result=result)
+            logger.info(f"MSDS job {job_id} finished.")
+        except Exception as e:
+            logger.error(f"MSDS job {job_id} failed: {str(e)}", exc_info=True)
+            self._update(job_id, status=JOB_STATUS_FAILED, stage="failed", finished_at=time.time(), error=str(e))
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            state = self._jobs[job_id]
+            state.update(changes)
+        self._save(state)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.state_dir, job_id + ".json")
+
+    def _save(self, state):
+        with self._lock:
+            data = json.dumps(state)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=self.state_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self._state_path(state["job_id"]))
+        except OSError as e:
+            logger.warning(f"Could not save state of MSDS job {state['job_id']}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _cleanup_expired(self):
+        """Forget finished jobs older than the TTL (at most once a minute)."""
+        now = time.time()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        expired_before = now - self.job_ttl_seconds
+
+        with self._lock:
+            for job_id in [job_id for job_id, state in self._jobs.items()
+                           if state["finished_at"] and state["finished_at"] < expired_before]:
+                del self._jobs[job_id]
+        try:
+            with os.scandir(self.state_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".json") and entry.stat().st_mtime < expired_before:
+                        os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"Could not clean up expired MSDS jobs: {e}")
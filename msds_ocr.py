@@ -0,0 +1,178 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from chemsure_metrics import PDF_PAGES, record_stage, time_stage
+
+logger = logging.getLogger(__name__)
+
+# --- Page-level OCR on a bounded process pool ---
+# Tesseract is CPU bound, so scanned pages are rasterized and recognized in separate processes,
+# one page per task. pdf2image/pytesseract are imported inside the workers only: processes that
+# never OCR anything (and the Flask workers at startup) don't pay for them.
+
+# Web server processes on the host (gunicorn.conf.py exports its worker count); each owns a pool
+WEB_WORKERS = max(1, int(os.environ.get("CHEMSURE_WEB_WORKERS", 1)))
+# Maximum number of OCR processes of this process. The default splits the CPU cores across the
+# web workers, so all pools together run about one OCR process per core instead of one per core
+# in every worker. 0 OCRs in the calling process, for callers that already run one document per
+# core (see bulk_screen_msds.py)
+OCR_MAX_WORKERS = int(os.environ.get("CHEMSURE_OCR_WORKERS", max(1, (os.cpu_count() or 1) // WEB_WORKERS)))
+# Resolution used to rasterize scanned pages; higher DPI gives better OCR
+OCR_DPI = int(os.environ.get("CHEMSURE_OCR_DPI", 300))
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+
+def preprocess_image(image):
+    """Enhance image quality for better OCR recognition."""
+    from PIL import ImageEnhance, ImageFilter
+
+    image = image.convert("L") # Convert to grayscale
+    image = image.filter(ImageFilter.SHARPEN)
+    enhancer = ImageEnhance.Contrast(image)
+    image = enhancer.enhance(2) # Increase contrast
+    return image
+
+
+def ocr_pdf_page(pdf_path, page_number, dpi=OCR_DPI):
+    """Rasterize one page (1-based) of a PDF file and OCR it. Runs in a pool worker.
+
+    Returns (text, timings), timings being the seconds spent per stage, which the
+    parent process records (metrics of pool workers would never be scraped).
+    """
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    timings = {"ocr_rasterize": 0.0, "ocr_preprocess": 0.0, "ocr_tesseract": 0.0}
+    start = time.perf_counter()
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    timings["ocr_rasterize"] = time.perf_counter() - start
+
+    texts = []
+    for img in images:
+        start = time.perf_counter()
+        img = preprocess_image(img)
+        timings["ocr_preprocess"] += time.perf_counter() - start
+        start = time.perf_counter()
+        texts.append(pytesseract.image_to_string(img))
+        timings["ocr_tesseract"] += time.perf_counter() - start
+    return "\n".join(texts), timings
+
+
+def count_pdf_pages(pdf_path):
+    """Page count from Poppler, for PDFs that pdfplumber cannot open."""
+    from pdf2image import pdfinfo_from_path
+
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+
+def get_ocr_pool():
+    """Returns the shared OCR process pool, creating it on first use."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            # "spawn" rather than fork: the Flask process is multi-threaded by the time OCR is needed
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=OCR_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Started OCR process pool with {OCR_MAX_WORKERS} workers.")
+        return _ocr_pool
+
+
+def shutdown_ocr_pool():
+    """Stops the OCR pool (it is recreated on the next OCR request)."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None:
+            _ocr_pool.shutdown(wait=True, cancel_futures=True)
+            _ocr_pool = None
+
+
+def _submit_ocr_page(pdf_path, page_number):
+    """Queue one page on the pool, replacing the pool if a crashed worker has broken it."""
+    global _ocr_pool
+    if OCR_MAX_WORKERS <= 0:
+        # No pool: OCR right here and hand back an already completed future
+        future = Future()
+        try:
+            future.set_result(ocr_pdf_page(pdf_path, page_number))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    pool = get_ocr_pool()
+    try:
+        return pool.submit(ocr_pdf_page, pdf_path, page_number)
+    except BrokenProcessPool:
+        logger.warning("OCR process pool is broken (a worker died), starting a new one.")
+        with _ocr_pool_lock:
+            if _ocr_pool is pool:
+                _ocr_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        return get_ocr_pool().submit(ocr_pdf_page, pdf_path, page_number)
+
+
+def _ocr_result(page_number, future, fallback_text):
+    """Wait for an OCR page; fall back to the page's own (short) text if OCR itself fails."""
+    try:
+        with time_stage("ocr_wait"): # Time the caller is blocked on the pool, beyond its own work
+            text, timings = future.result()
+        for stage, seconds in timings.items():
+            record_stage(stage, seconds)
+        return text, True
+    except Exception as e:
+        if not fallback_text or not fallback_text.strip():
+            raise
+        logger.warning(f"OCR failed for page {page_number}, keeping its extracted text instead: {e}")
+        return fallback_text, False
+
+
+def iter_page_texts(pdf_path, page_texts, min_page_text_chars, max_in_flight=None):
+    """Yield (page_number, text, was_ocr) in page order for the PDF at `pdf_path`.
+
+    `page_texts` is an iterable of already extracted text (or None) per page. Pages whose text
+    is shorter than `min_page_text_chars` are OCR'd on the pool, with at most `max_in_flight`
+    pages queued ahead of the one being yielded. Closing the generator early (e.g. once the
+    section of interest has been read) cancels every page that hasn't started yet.
+    """
+    max_in_flight = max_in_flight or max(1, 2 * OCR_MAX_WORKERS)
+    pending = deque() # (page_number, text or Future, extracted text), in page order
+    in_flight = 0
+
+    try:
+        for page_number, text in enumerate(page_texts, start=1):
+            if text is not None and len(text.strip()) >= min_page_text_chars:
+                pending.append((page_number, text, text))
+                PDF_PAGES.inc(method="text")
+            else:
+                PDF_PAGES.inc(method="ocr")
+                future = _submit_ocr_page(pdf_path, page_number)
+                pending.append((page_number, future, text))
+                in_flight += 1
+
+            # Hand out every page that is ready, and block on the oldest OCR page once the window is full
+            while pending and (isinstance(pending[0][1], str) or pending[0][1].done() or in_flight >= max_in_flight):
+                page_number, item, text = pending.popleft()
+                if isinstance(item, str):
+                    yield page_number, item, False
+                else:
+                    in_flight -= 1
+                    yield (page_number, *_ocr_result(page_number, item, text))
+
+        while pending:
+            page_number, item, text = pending.popleft()
+            if isinstance(item, str):
+                yield page_number, item, False
+            else:
+                yield (page_number, *_ocr_result(page_number, item, text))
+    finally:
+        for _, item, _ in pending:
+            if not isinstance(item, str):
+                item.cancel()
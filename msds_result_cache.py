@@ -0,0 +1,185 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# --- Content-addressed cache of MSDS processing results ---
+# Suppliers send the same SDS PDFs again and again. Results are keyed on the SHA-256 of the
+# uploaded bytes plus the version of the GADSL list they were matched against, so a repeat
+# upload skips pdfplumber/OCR entirely, and a reloaded list can never serve stale matches.
+# Two tiers: a small in-memory LRU per process, and a gzip'd JSON directory shared by all
+# workers on the host, evicted oldest-first once it grows past its byte budget. Every worker
+# writes to that directory, so its size is re-read from disk every `disk_rescan_seconds`
+# rather than counted per process; in between, a worker only adds its own writes.
+
+_CACHE_FILE_SUFFIX = ".json.gz"
+
+
+def make_msds_cache_key(pdf_bytes, data_version, variant=""):
+    """Cache key for a document: content hash, GADSL list version and processing variant."""
+    key = f"{hashlib.sha256(pdf_bytes).hexdigest()}-{data_version[:16]}"
+    return f"{key}-{variant}" if variant else key
+
+
+class MsdsResultCache:
+    """Two-tier (memory LRU + disk) cache of {"text": ..., "matches": [...]} results."""
+
+    def __init__(self, max_memory_entries=128, disk_dir=None, max_disk_bytes=512 * 1024 * 1024, disk_rescan_seconds=30):
+        self.max_memory_entries = max_memory_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_rescan_seconds = disk_rescan_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None # Size of the disk tier at the last scan, plus this process's writes since
+        self._disk_scanned_at = None
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "disk_evictions": 0}
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + _CACHE_FILE_SUFFIX)
+
+    def get(self, key):
+        """Returns the cached result for `key`, or None."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return value
+
+        value = self._read_disk(key) if self.disk_dir else None
+        with self._lock:
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        """Stores a result in both tiers."""
+        with self._lock:
+            self._counters["stores"] += 1
+            self._remember(key, value)
+        if self.disk_dir:
+            try:
+                self._write_disk(key, value)
+            except OSError as e:
+                logger.warning(f"Could not write MSDS cache entry {key}: {e}")
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path) # Bump recency for eviction
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable MSDS cache entry {path}: {e}")
+            self._remove_file(path)
+            return None
+
+    def _write_disk(self, key, value):
+        data = gzip.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        path = self._disk_path(key)
+        try:
+            replaced_bytes = os.stat(path).st_size # Rewriting an entry only adds the difference
+        except OSError:
+            replaced_bytes = 0
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=self.disk_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path) # Atomic, so readers never see half an entry
+        except BaseException:
+            self._remove_file(tmp_path)
+            raise
+
+        with self._lock:
+            now = time.monotonic()
+            rescan = self._disk_scanned_at is None or now - self._disk_scanned_at >= self.disk_rescan_seconds
+            if rescan:
+                self._disk_scanned_at = now # Other threads keep counting until the scan is done
+            elif self._disk_bytes is not None:
+                self._disk_bytes += len(data) - replaced_bytes
+        if rescan:
+            # The other workers' entries are only seen by reading the directory
+            disk_bytes = sum(size for _, size, _ in self._scan_disk())
+            with self._lock:
+                self._disk_bytes = disk_bytes
+        with self._lock:
+            over_budget = self._disk_bytes is not None and self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _scan_disk(self):
+        """(path, size, mtime) of every entry in the disk tier."""
+        entries = []
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if entry.name.endswith(_CACHE_FILE_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue # Evicted by another worker meanwhile
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict_disk(self):
+        """Delete least recently used entries until the disk tier is back under 90% of its budget."""
+        entries = sorted(self._scan_disk(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            if self._remove_file(path):
+                evicted += 1
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+            self._disk_scanned_at = time.monotonic()
+            self._counters["disk_evictions"] += evicted
+        logger.info(f"MSDS cache: evicted {evicted} disk entries, {total} bytes remain.")
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def clear_memory(self):
+        """Drops the in-memory tier (e.g. after the GADSL data has been reloaded)."""
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self):
+        """Hit/miss counters and tier sizes."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_bytes"] = self._disk_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,394 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# --- On-disk index of screened SDSs, for re-screening them when the GADSL list changes ---
+# Every processed document is stored with what it was matched on: the CAS RNs found in its
+# text, the GADSL name keys it matched, and the searched text itself (in an FTS5 table, so the
+# documents that mention a newly listed name can be found without reading every text). Each
+# list version also stores a fingerprint of every CAS RN and name key.
+#
+# When a new version is loaded, the fingerprints of the version documents were screened
+# against are diffed with the new ones, and only documents whose CAS RNs or names touch an
+# added, removed or changed key are matched again, from their stored text (no PDF, no OCR).
+# The differences in their matches are kept as a re-screening report.
+#
+# SQLite in WAL mode lets every web worker and bulk screening process share the file.
+#
+# The stored text is what dominates the file size (the Section 3 block, or the whole text of
+# an SDS without one), so the index keeps at most `max_documents` documents: the ones
+# screened longest ago are dropped, and are simply not re-screened any more.
+
+# New documents between two checks of the document limit
+_PRUNE_INTERVAL = 100
+
+# A running re-screening touches its report after every batch; a report silent for longer than
+# this (or whose process on this host has exited) is taken over by the next process that claims it
+REPORT_HEARTBEAT_TIMEOUT_SECONDS = 15 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    doc_key TEXT NOT NULL UNIQUE, -- content hash + processing variant
+    sha256 TEXT NOT NULL,
+    name TEXT,
+    gadsl_version TEXT NOT NULL, -- list version the stored matches are valid for
+    matches TEXT NOT NULL,
+    screened_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_by_version ON documents (gadsl_version);
+CREATE INDEX IF NOT EXISTS documents_by_screened_at ON documents (screened_at);
+CREATE TABLE IF NOT EXISTS document_cas (
+    cas_rn TEXT NOT NULL, document_id INTEGER NOT NULL, PRIMARY KEY (cas_rn, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS document_cas_by_document ON document_cas (document_id);
+CREATE TABLE IF NOT EXISTS document_names (
+    name_key TEXT NOT NULL, document_id INTEGER NOT NULL, PRIMARY KEY (name_key, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS document_names_by_document ON document_names (document_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS document_text USING fts5(text); -- rowid = documents.id
+CREATE TABLE IF NOT EXISTS gadsl_keys (
+    version TEXT NOT NULL, key TEXT NOT NULL, fingerprint TEXT NOT NULL, PRIMARY KEY (version, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rescreen_reports (
+    id INTEGER PRIMARY KEY,
+    from_version TEXT NOT NULL,
+    to_version TEXT NOT NULL,
+    status TEXT NOT NULL, -- running, done or failed
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    keys_changed INTEGER,
+    documents_checked INTEGER,
+    documents_changed INTEGER,
+    error TEXT,
+    owner TEXT, -- "<host>:<pid>" of the process running or last running it
+    heartbeat_at REAL, -- last sign of life of a running report
+    UNIQUE (from_version, to_version)
+);
+CREATE TABLE IF NOT EXISTS rescreen_changes (
+    report_id INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    added TEXT NOT NULL,
+    removed TEXT NOT NULL,
+    PRIMARY KEY (report_id, document_id)
+);
+"""
+
+# Key prefixes of the fingerprints: CAS RN index keys and substance name index keys
+CAS_KEY_PREFIX = "cas:"
+NAME_KEY_PREFIX = "name:"
+
+
+def fingerprint_entries(entries):
+    """Short, stable hash of the entries behind one index key."""
+    data = json.dumps(entries, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _entry_identity(entry):
+    return json.dumps(entry, sort_keys=True, ensure_ascii=False)
+
+
+def diff_matches(before, after):
+    """(added, removed) entries between two match lists; an entry that changed appears in both."""
+    before_ids = {_entry_identity(entry) for entry in before}
+    after_ids = {_entry_identity(entry) for entry in after}
+    added = [entry for entry in after if _entry_identity(entry) not in before_ids]
+    removed = [entry for entry in before if _entry_identity(entry) not in after_ids]
+    return added, removed
+
+
+def _process_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_has_exited(owner):
+    """True if `owner` was a process on this host that no longer exists (e.g. a killed worker)."""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False # Another host's process: only the heartbeat timeout tells
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass # Exists, but belongs to another user
+    return False
+
+
+def _fts_phrase(name):
+    """FTS5 query for `name` as a phrase (every token, in order)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class MsdsScreeningIndex:
+    """Screened documents, their identifiers and per-version key fingerprints in one SQLite file."""
+
+    def __init__(self, path, max_documents=None):
+        self.path = path
+        self.max_documents = max_documents # None or 0: keep every document
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            # Files created before reports had an owner
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(rescreen_reports)")}
+            for column, column_type in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    try:
+                        connection.execute(f"ALTER TABLE rescreen_reports ADD COLUMN {column} {column_type}")
+                    except sqlite3.OperationalError as e:
+                        if "duplicate column" not in str(e):
+                            raise # Otherwise another process added it meanwhile
+
+    @contextmanager
+    def _connect(self):
+        """A connection for one operation, committed (or rolled back) and closed afterwards."""
+        # Short-lived connections, so threads and processes never share one
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    # --- Documents ---
+
+    def record_document(self, doc_key, sha256, name, gadsl_version, text, cas_rns, name_keys, matches):
+        """Store (or replace) a screened document with the identifiers it was matched on."""
+        with self._connect() as connection:
+            row = connection.execute("SELECT id, name FROM documents WHERE doc_key = ?", (doc_key,)).fetchone()
+            if row is None:
+                document_id = connection.execute(
+                    "INSERT INTO documents (doc_key, sha256, name, gadsl_version, matches, screened_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (doc_key, sha256, name, gadsl_version, json.dumps(matches), time.time()),
+                ).lastrowid
+            else:
+                document_id = row["id"]
+                connection.execute(
+                    "UPDATE documents SET name = ?, gadsl_version = ?, matches = ?, screened_at = ? WHERE id = ?",
+                    (name or row["name"], gadsl_version, json.dumps(matches), time.time(), document_id),
+                )
+                connection.execute("DELETE FROM document_text WHERE rowid = ?", (document_id,))
+            connection.execute("INSERT INTO document_text (rowid, text) VALUES (?, ?)", (document_id, text))
+            self._replace_identifiers(connection, document_id, cas_rns, name_keys)
+            if row is None and self.max_documents and document_id % _PRUNE_INTERVAL == 0:
+                self._prune(connection)
+        return document_id
+
+    def _prune(self, connection):
+        """Drop the documents screened longest ago beyond `max_documents`, with their text and report entries."""
+        old_ids = [row[0] for row in connection.execute(
+            "SELECT id FROM documents ORDER BY screened_at DESC LIMIT -1 OFFSET ?", (self.max_documents,))]
+        for table, column in (("documents", "id"), ("document_text", "rowid"), ("document_cas", "document_id"),
+                              ("document_names", "document_id"), ("rescreen_changes", "document_id")):
+            connection.executemany(f"DELETE FROM {table} WHERE {column} = ?", ((document_id,) for document_id in old_ids))
+
+    @staticmethod
+    def _replace_identifiers(connection, document_id, cas_rns, name_keys):
+        connection.execute("DELETE FROM document_cas WHERE document_id = ?", (document_id,))
+        connection.execute("DELETE FROM document_names WHERE document_id = ?", (document_id,))
+        connection.executemany("INSERT OR IGNORE INTO document_cas VALUES (?, ?)",
+                               ((cas_rn, document_id) for cas_rn in cas_rns))
+        connection.executemany("INSERT OR IGNORE INTO document_names VALUES (?, ?)",
+                               ((name_key, document_id) for name_key in name_keys))
+
+    def document_versions(self):
+        """List version -> number of documents whose stored matches are valid for it."""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT gadsl_version, COUNT(*) AS count FROM documents GROUP BY gadsl_version")
+            return {row["gadsl_version"]: row["count"] for row in rows}
+
+    def documents_at_version(self, version):
+        """Document id -> screened_at of every document whose stored matches are valid for `version`."""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT id, screened_at FROM documents WHERE gadsl_version = ?", (version,))
+            return {row["id"]: row["screened_at"] for row in rows}
+
+    def iter_document_batches(self, document_ids, batch_size=500):
+        """Lists of stored documents (id, name, gadsl_version, matches, text), `batch_size` at a time."""
+        for offset in range(0, len(document_ids), batch_size):
+            batch = document_ids[offset:offset + batch_size]
+            with self._connect() as connection:
+                rows = connection.execute(
+                    "SELECT d.id, d.name, d.gadsl_version, d.matches, t.text FROM documents d "
+                    f"JOIN document_text t ON t.rowid = d.id WHERE d.id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+            yield [{**dict(row), "matches": json.loads(row["matches"])} for row in rows]
+
+    # --- List versions ---
+
+    def has_version(self, version):
+        with self._connect() as connection:
+            return connection.execute("SELECT 1 FROM gadsl_keys WHERE version = ? LIMIT 1", (version,)).fetchone() is not None
+
+    def record_version(self, version, fingerprints):
+        """Store the fingerprint of every index key ("cas:<CAS RN>", "name:<name key>") of a list version."""
+        with self._connect() as connection:
+            connection.executemany("INSERT OR IGNORE INTO gadsl_keys VALUES (?, ?, ?)",
+                                   ((version, key, fingerprint) for key, fingerprint in fingerprints.items()))
+
+    def diff_versions(self, old_version, new_version):
+        """{"added": [...], "removed": [...], "changed": [...]} index keys between two list versions."""
+        with self._connect() as connection:
+            # Two anti-joins and a join on the (version, key) primary key
+            added = [row[0] for row in connection.execute(
+                "SELECT key FROM gadsl_keys n WHERE version = ? AND NOT EXISTS "
+                "(SELECT 1 FROM gadsl_keys o WHERE o.version = ? AND o.key = n.key)", (new_version, old_version))]
+            removed = [row[0] for row in connection.execute(
+                "SELECT key FROM gadsl_keys o WHERE version = ? AND NOT EXISTS "
+                "(SELECT 1 FROM gadsl_keys n WHERE n.version = ? AND n.key = o.key)", (old_version, new_version))]
+            changed = [row[0] for row in connection.execute(
+                "SELECT o.key FROM gadsl_keys o JOIN gadsl_keys n ON n.version = ? AND n.key = o.key "
+                "WHERE o.version = ? AND o.fingerprint != n.fingerprint", (new_version, old_version))]
+        return {"added": added, "removed": removed, "changed": changed}
+
+    def forget_unused_versions(self, keep_version):
+        """Drop the fingerprints of versions no stored document refers to any more."""
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM gadsl_keys WHERE version != ? AND version NOT IN (SELECT DISTINCT gadsl_version FROM documents)",
+                (keep_version,),
+            )
+
+    def impacted_documents(self, version, diff, added_names):
+        """Ids of the documents screened against `version` that a key diff can affect.
+
+        A document is affected when it contains a CAS RN whose entries were added, removed or
+        changed, matched a name whose entry was removed or changed, or mentions one of
+        `added_names` (display names of the new name keys) in its text.
+        """
+        cas_rns = [key[len(CAS_KEY_PREFIX):] for keys in diff.values() for key in keys if key.startswith(CAS_KEY_PREFIX)]
+        name_keys = [key[len(NAME_KEY_PREFIX):] for kind in ("removed", "changed") for key in diff[kind]
+                     if key.startswith(NAME_KEY_PREFIX)]
+        impacted = set()
+        with self._connect() as connection:
+            connection.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_keys (key TEXT PRIMARY KEY) WITHOUT ROWID")
+            for table, column, keys in (("document_cas", "cas_rn", cas_rns), ("document_names", "name_key", name_keys)):
+                connection.execute("DELETE FROM wanted_keys")
+                connection.executemany("INSERT OR IGNORE INTO wanted_keys VALUES (?)", ((key,) for key in keys))
+                impacted.update(row[0] for row in connection.execute(
+                    f"SELECT DISTINCT t.document_id FROM wanted_keys w JOIN {table} t ON t.{column} = w.key "
+                    f"JOIN documents d ON d.id = t.document_id WHERE d.gadsl_version = ?", (version,)))
+            for name in added_names:
+                if not any(character.isalnum() for character in name):
+                    continue # No word to search for
+                impacted.update(row[0] for row in connection.execute(
+                    "SELECT d.id FROM document_text JOIN documents d ON d.id = document_text.rowid "
+                    "WHERE document_text MATCH ? AND d.gadsl_version = ?", (_fts_phrase(name), version)))
+        return sorted(impacted)
+
+    def move_documents(self, old_version, new_version, documents):
+        """Mark the (unaffected) documents screened against `old_version` as valid for `new_version`.
+
+        `documents` maps document ids to their screened_at, as returned by documents_at_version()
+        before the re-screening started. Only those documents move, and only if they were not
+        recorded again since: a worker still on the old list may keep adding documents to it.
+        """
+        with self._connect() as connection:
+            connection.executemany(
+                "UPDATE documents SET gadsl_version = ? WHERE id = ? AND gadsl_version = ? AND screened_at = ?",
+                ((new_version, document_id, old_version, screened_at) for document_id, screened_at in documents.items()),
+            )
+
+    # --- Re-screening reports ---
+
+    def claim_report(self, from_version, to_version):
+        """Start (or continue) the report of a version change; None if another process is running it.
+
+        An existing report is continued into the same report: one that finished, for documents
+        recorded against `from_version` after it ran (by a worker still on the old list); one
+        that failed, so the next load retries; and one left running by a process that exited or
+        stopped sending heartbeats. Documents an earlier run already re-screened are on the new
+        version, so they are not matched again, and their changes stay in the report.
+        """
+        owner = _process_owner()
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO rescreen_reports (from_version, to_version, status, started_at, owner, heartbeat_at) "
+                "VALUES (?, ?, 'running', ?, ?, ?)",
+                (from_version, to_version, now, owner, now),
+            )
+            if cursor.rowcount:
+                return cursor.lastrowid
+            row = connection.execute(
+                "SELECT id, status, owner, COALESCE(heartbeat_at, started_at) AS heartbeat_at FROM rescreen_reports "
+                "WHERE from_version = ? AND to_version = ?",
+                (from_version, to_version),
+            ).fetchone()
+            if row is None:
+                return None
+            if row["status"] == "running":
+                abandoned = now - row["heartbeat_at"] > REPORT_HEARTBEAT_TIMEOUT_SECONDS or _owner_has_exited(row["owner"])
+                if not abandoned:
+                    return None
+            # Conditional on the status and owner read above, so only one process takes the report over
+            cursor = connection.execute(
+                "UPDATE rescreen_reports SET status = 'running', started_at = ?, finished_at = NULL, error = NULL, "
+                "owner = ?, heartbeat_at = ? WHERE id = ? AND status = ? AND owner IS ?",
+                (now, owner, now, row["id"], row["status"], row["owner"]))
+            return row["id"] if cursor.rowcount else None
+
+    def store_rescreened(self, report_id, gadsl_version, results, changes):
+        """Store a batch of re-screened documents in one transaction, counting them in the report.
+
+        `results` are (document id, matched name keys, matches) for every document matched
+        again (their text and CAS RNs don't change); `changes` are (document id, added,
+        removed) for the ones whose matches changed. Returns False, storing nothing, if the
+        report was taken over by another process meanwhile.
+        """
+        with self._connect() as connection:
+            # Doubles as the heartbeat of the running report
+            cursor = connection.execute(
+                "UPDATE rescreen_reports SET heartbeat_at = ?, documents_checked = COALESCE(documents_checked, 0) + ?, "
+                "documents_changed = COALESCE(documents_changed, 0) + ? WHERE id = ? AND status = 'running' AND owner = ?",
+                (time.time(), len(results), len(changes), report_id, _process_owner()))
+            if not cursor.rowcount:
+                return False
+            for document_id, name_keys, matches in results:
+                connection.execute("UPDATE documents SET gadsl_version = ?, matches = ? WHERE id = ?",
+                                   (gadsl_version, json.dumps(matches), document_id))
+                connection.execute("DELETE FROM document_names WHERE document_id = ?", (document_id,))
+                connection.executemany("INSERT OR IGNORE INTO document_names VALUES (?, ?)",
+                                       ((name_key, document_id) for name_key in name_keys))
+            connection.executemany("INSERT OR REPLACE INTO rescreen_changes VALUES (?, ?, ?, ?)",
+                                   ((report_id, document_id, json.dumps(added), json.dumps(removed))
+                                    for document_id, added, removed in changes))
+        return True
+
+    def finish_report(self, report_id, status, keys_changed=None, error=None):
+        """Close a report this process is running; a report taken over by another process is left alone."""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE rescreen_reports SET status = ?, finished_at = ?, keys_changed = COALESCE(?, keys_changed), "
+                "error = ? WHERE id = ? AND owner = ?",
+                (status, time.time(), keys_changed, error, report_id, _process_owner()),
+            )
+
+    def list_reports(self, limit=20):
+        with self._connect() as connection:
+            rows = connection.execute("SELECT * FROM rescreen_reports ORDER BY id DESC LIMIT ?", (limit,))
+            return [dict(row) for row in rows]
+
+    def get_report(self, report_id):
+        """A report with every document whose matches changed, or None."""
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM rescreen_reports WHERE id = ?", (report_id,)).fetchone()
+            if row is None:
+                return None
+            report = dict(row)
+            report["documents"] = [
+                {"document_id": change["document_id"], "name": change["name"], "sha256": change["sha256"],
+                 "added": json.loads(change["added"]), "removed": json.loads(change["removed"])}
+                for change in connection.execute(
+                    "SELECT c.*, d.name, d.sha256 FROM rescreen_changes c JOIN documents d ON d.id = c.document_id "
+                    "WHERE c.report_id = ? ORDER BY c.document_id", (report_id,))
+            ]
+        return report
@@ -0,0 +1,67 @@
+import re
+
+# --- Single-pass tokenizer for extracted MSDS text ---
+# One precompiled alternation splits the text into CAS RN candidates and words in a single
+# left-to-right pass: the CAS branch reads at most 13 characters per attempt, and the word
+# branch ends the pattern, so the regex engine never backtracks over earlier input. Words feed
+# the substance name scanner (which matches name n-grams word by word), CAS candidates go to
+# the CAS index, and neither needs a second pass or a re-validation with `re.fullmatch`.
+#
+# Section boundaries are found the same way: instead of one lazy DOTALL pattern spanning
+# SECTION 3 ... on Ingredients ... SECTION 4 (which backtracks cubically on text with many
+# SECTION 3 headers but no SECTION 4), the three anchors are searched for one after another.
+
+# CAS RN: digits-digits-digit (e.g., 75-07-0, 1333-82-0, 13463-67-7) not inside a longer word;
+# otherwise a word: a run of letters/digits
+_TOKEN_PATTERN = re.compile(r"(?<!\w)(\d{2,7}-\d{2}-\d)(?!\w)|[^\W_]+")
+
+# Each repeated class is followed by a character it can't match, so there is nothing to backtrack into
+SECTION_3_HEADER = re.compile(r"SECTION\s*3[:\s]*Composition/Information", re.IGNORECASE)
+SECTION_4_HEADER = re.compile(r"SECTION\s*4[:\s]*First Aid Measures", re.IGNORECASE)
+_INGREDIENTS_MARKER = re.compile(r"on Ingredients", re.IGNORECASE)
+
+
+def tokenize_msds_text(text):
+    """Split `text` into (cas_candidates, words) in one pass.
+
+    cas_candidates are the CAS RN-shaped strings in document order; words are
+    (start, end, casefolded word) tuples, including the digit groups of every CAS RN, so
+    the name scanner sees exactly the words of the text.
+    """
+    cas_candidates = []
+    words = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        cas = match.group(1)
+        if cas is None:
+            words.append((match.start(), match.end(), match.group().casefold()))
+            continue
+        cas_candidates.append(cas)
+        # Split the candidate into its three digit groups without another regex pass
+        start = match.start()
+        first_dash = cas.index("-")
+        second_dash = len(cas) - 2
+        words.append((start, start + first_dash, cas[:first_dash]))
+        words.append((start + first_dash + 1, start + second_dash, cas[first_dash + 1:second_dash]))
+        words.append((start + second_dash + 1, match.end(), cas[-1]))
+    return cas_candidates, words
+
+
+def find_section_3(text):
+    """(start, end) of the Section 3 block, through the SECTION 4 header, or None.
+
+    Matches the same span as the pattern
+    SECTION\\s*3[:\\s]*Composition/Information.*?on Ingredients.*?SECTION\\s*4[:\\s]*First Aid Measures
+    (case-insensitive, DOTALL), in linear time.
+    """
+    header = SECTION_3_HEADER.search(text)
+    if header is None:
+        return None
+    # Later SECTION 3 headers can only have a subset of the text after the first one, so if
+    # the first header doesn't start a complete block, none does
+    marker = _INGREDIENTS_MARKER.search(text, header.end())
+    if marker is None:
+        return None
+    end_header = SECTION_4_HEADER.search(text, marker.end())
+    if end_header is None:
+        return None
+    return header.start(), end_header.end()
@@ -7,6 +7,16 @@ document.addEventListener("DOMContentLoaded", () => {
     const uploadPdfButton = document.getElementById("uploadPdfButton");
     const clearSearchButton = document.getElementById("clearSearchButton");
     const progressBar = document.getElementById("uploadProgress");
+    const progressText = document.getElementById("uploadProgressText");
+    const processInBackground = document.getElementById("processInBackground");
+
+    const substanceNameInput = document.getElementById("substanceName");
+    const substanceSuggestions = document.getElementById("substanceSuggestions");
+
+    const JOB_POLL_INTERVAL_MS = 1000; // How often a background MSDS job is polled for progress
+    const SUGGEST_DELAY_MS = 150; // Wait for a pause in typing before asking for suggestions
+    const SUGGEST_MIN_LENGTH = 2;
+    const SUGGEST_LIMIT = 10;
 
     // Initial clear of results on page load
     clearAllSearchElements();
@@ -40,9 +50,111 @@ document.addEventListener("DOMContentLoaded", () => {
         `;
         clearErrorMessage();
         progressBar.style.display = "none"; // Ensure progress bar is hidden on clear
+        setProgressText("Processing...");
         console.log("All inputs and results cleared.");
     }
 
+    // Helper function to update the text next to the spinner
+    function setProgressText(text) {
+        if (progressText) {
+            progressText.textContent = text;
+        }
+    }
+
+    // Describe the progress reported by a background MSDS job
+    function describeJobProgress(job) {
+        if (job.status === "queued") {
+            return "Waiting in queue...";
+        }
+        const progress = job.progress || {};
+        if (job.stage === "extracting_text" && progress.pages_done) {
+            const pageCount = progress.page_count ? ` of ${progress.page_count}` : "";
+            const ocrPages = progress.ocr_pages ? ` (${progress.ocr_pages} scanned page(s) OCR'd)` : "";
+            return `Reading page ${progress.pages_done}${pageCount}${ocrPages}...`;
+        }
+        if (job.stage === "matching") {
+            return "Matching substances against GADSL...";
+        }
+        return "Processing...";
+    }
+
+    // Submit a PDF as a background job and poll it until it finishes; resolves to the result data
+    async function runMsdsJob(formData) {
+        const submitResponse = await fetch("/msds_jobs", {
+            method: "POST",
+            body: formData,
+        });
+        const submitData = await submitResponse.json();
+        if (!submitResponse.ok) {
+            showErrorMessage(submitData.error || `Error: ${submitResponse.status} ${submitResponse.statusText}`);
+            throw new Error(`HTTP error! status: ${submitResponse.status}, message: ${JSON.stringify(submitData)}`);
+        }
+        console.log("MSDS job submitted:", submitData.job_id);
+
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+
+            const statusResponse = await fetch(submitData.status_url);
+            const job = await statusResponse.json();
+            if (!statusResponse.ok) {
+                showErrorMessage(job.error || `Error: ${statusResponse.status} ${statusResponse.statusText}`);
+                throw new Error(`HTTP error! status: ${statusResponse.status}, message: ${JSON.stringify(job)}`);
+            }
+
+            setProgressText(describeJobProgress(job));
+            if (job.status === "done" || job.status === "failed") {
+                const resultResponse = await fetch(submitData.result_url);
+                const resultData = await resultResponse.json();
+                if (!resultResponse.ok) {
+                    showErrorMessage(resultData.error || `Error: ${resultResponse.status} ${resultResponse.statusText}`);
+                    throw new Error(`HTTP error! status: ${resultResponse.status}, message: ${JSON.stringify(resultData)}`);
+                }
+                return resultData;
+            }
+        }
+    }
+
+    // Typeahead: suggest GADSL substance names (prefix and typo-tolerant matches) as the user types
+    if (substanceNameInput && substanceSuggestions) {
+        let suggestTimer = null;
+        let suggestController = null;
+
+        substanceNameInput.addEventListener("input", () => {
+            clearTimeout(suggestTimer);
+            const query = substanceNameInput.value.trim();
+            if (query.length < SUGGEST_MIN_LENGTH) {
+                substanceSuggestions.innerHTML = "";
+                return;
+            }
+
+            suggestTimer = setTimeout(async () => {
+                if (suggestController) {
+                    suggestController.abort(); // Drop the answer to an older, now outdated query
+                }
+                suggestController = new AbortController();
+                try {
+                    const params = new URLSearchParams({ q: query, limit: SUGGEST_LIMIT });
+                    const response = await fetch(`/suggest_substances?${params}`, { signal: suggestController.signal });
+                    if (!response.ok) {
+                        return; // Suggestions are best effort; the search itself still works
+                    }
+                    const data = await response.json();
+                    substanceSuggestions.innerHTML = "";
+                    (data.suggestions || []).forEach(suggestion => {
+                        const option = document.createElement("option");
+                        option.value = suggestion.substance_name;
+                        option.label = `CAS RN: ${suggestion.cas_rn}`;
+                        substanceSuggestions.appendChild(option);
+                    });
+                } catch (error) {
+                    if (error.name !== "AbortError") {
+                        console.error("Error fetching substance suggestions:", error);
+                    }
+                }
+            }, SUGGEST_DELAY_MS);
+        });
+    }
+
     // Event listener for CAS/Substance search form submission
     if (searchForm) {
         searchForm.addEventListener("submit", async (event) => {
@@ -83,11 +195,8 @@ document.addEventListener("DOMContentLoaded", () => {
             }
 
             try {
-                const response = await fetch(endpoint, {
-                    method: "POST",
-                    headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify(payload),
-                });
+                // GET, so the browser can cache the answer and revalidate it with its ETag
+                const response = await fetch(`${endpoint}?${new URLSearchParams(payload)}`);
 
                 console.log("Fetch response status:", response.status, response.statusText);
 
@@ -159,23 +268,30 @@ document.addEventListener("DOMContentLoaded", () => {
             const formData = new FormData();
             formData.append("msds_pdf", file);
 
+            setProgressText("Processing...");
             progressBar.style.display = "block"; // Show progress indicator
 
             try {
-                const response = await fetch("/upload_msds_pdf", {
-                    method: "POST",
-                    body: formData, // FormData automatically sets Content-Type header
-                });
+                let data;
+                if (processInBackground && processInBackground.checked) {
+                    // Background mode: the server answers with a job ID right away and we poll for progress
+                    data = await runMsdsJob(formData);
+                } else {
+                    const response = await fetch("/upload_msds_pdf", {
+                        method: "POST",
+                        body: formData, // FormData automatically sets Content-Type header
+                    });
 
-                console.log("PDF Upload response status:", response.status, response.statusText);
+                    console.log("PDF Upload response status:", response.status, response.statusText);
 
-                if (!response.ok) {
-                    const errorData = await response.json();
-                    showErrorMessage(errorData.error || `Error: ${response.status} ${response.statusText}`);
-                    throw new Error(`HTTP error! status: ${response.status}, message: ${JSON.stringify(errorData)}`);
-                }
+                    if (!response.ok) {
+                        const errorData = await response.json();
+                        showErrorMessage(errorData.error || `Error: ${response.status} ${response.statusText}`);
+                        throw new Error(`HTTP error! status: ${response.status}, message: ${JSON.stringify(errorData)}`);
+                    }
 
-                const data = await response.json();
+                    data = await response.json();
+                }
                 console.log("Received PDF results:", data);
 
                 // Assuming data.results is always an array now
@@ -201,6 +317,7 @@ document.addEventListener("DOMContentLoaded", () => {
                 }
             } finally {
                 progressBar.style.display = "none"; // Ensure progress indicator is hidden on error/success
+                setProgressText("Processing...");
             }
         });
     } else {
@@ -0,0 +1,238 @@
+import re
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+# --- Aho-Corasick scanner for GADSL substance names ---
+# Every substance name (and synonym) is split into words, and the automaton runs over the
+# words of the document instead of its characters. Case, whitespace, hyphens and other
+# punctuation therefore never affect matching, hits always start and end on word
+# boundaries, and a whole document is scanned in one linear pass.
+#
+# The automaton is built with dicts, then flattened into arrays: a hashed vocabulary (word ->
+# word id), each node's children sorted by word id, and the failure/output links per node.
+
+# Words are runs of letters/digits; everything else (spaces, hyphens, commas, brackets) separates them
+_WORD_PATTERN = re.compile(r"[^\W_]+")
+
+# Words that are too generic to be reported as a substance hit on their own
+COMMON_WORDS_TO_EXCLUDE = {
+    "section", "table", "page", "figure", "date", "version", "composition",
+    "information", "ingredients", "measure", "first", "health", "safety", "data",
+    "sheet", "product", "chemical", "hazard", "identification", "handling", "storage",
+    "exposure", "protection", "physical", "properties", "stability", "reactivity",
+    "toxicological", "ecological", "disposal", "considerations", "transport", "regulatory",
+    "other", "company", "address", "phone", "fax", "email"
+}
+
+# Word ids are packed with node ids into a single integer key of the transition table while building
+_WORD_ID_BITS = 24
+
+
+def normalize_substance_name(name):
+    """Returns the case-, whitespace- and hyphen-insensitive form of a name (e.g. 'lead chromate')."""
+    return " ".join(_WORD_PATTERN.findall(name.casefold()))
+
+
+def substance_name_variants(name):
+    """Returns the name plus any synonyms written on separate lines or in parentheses within the cell."""
+    variants = [name]
+    for line in name.splitlines():
+        line = line.strip().strip("()").strip()
+        if line and line != name:
+            variants.append(line)
+    return variants
+
+
+def _word_slot(word):
+    """Stable hash of a word (unlike hash(), the same in every process) for the vocabulary table."""
+    return zlib.crc32(word.encode("utf-8"))
+
+
+def _build_tables(names):
+    """Build the automaton with dicts, then flatten it into the tables of SubstanceNameScanner.TABLES."""
+    word_ids = {}
+    transitions = {} # (node << _WORD_ID_BITS | word id) -> child node
+    fail = [0]
+    depth = [0]
+    outputs = [None] # Lookup keys ending exactly at a node
+    output_link = [0] # Nearest node on the failure chain that has outputs
+
+    for key, name in names.items():
+        for variant in substance_name_variants(name):
+            words = _WORD_PATTERN.findall(variant.casefold())
+            normalized = " ".join(words)
+            if len(normalized) <= 3 or normalized in COMMON_WORDS_TO_EXCLUDE:
+                continue # Too short or too generic to be a reliable hit
+            node = 0
+            for word in words:
+                word_id = word_ids.setdefault(word, len(word_ids))
+                edge = node << _WORD_ID_BITS | word_id
+                child = transitions.get(edge)
+                if child is None:
+                    child = len(fail)
+                    transitions[edge] = child
+                    fail.append(0)
+                    depth.append(depth[node] + 1)
+                    outputs.append(None)
+                    output_link.append(0)
+                node = child
+            if outputs[node] is None:
+                outputs[node] = []
+            if key not in outputs[node]:
+                outputs[node].append(key)
+
+    children = {}
+    for edge, child in transitions.items():
+        children.setdefault(edge >> _WORD_ID_BITS, []).append((edge & ((1 << _WORD_ID_BITS) - 1), child))
+
+    # Failure links breadth-first, so every failure target is finished before it is used
+    queue = deque(child for _, child in children.get(0, []))
+    while queue:
+        node = queue.popleft()
+        for word_id, child in children.get(node, []):
+            target_node = fail[node]
+            while target_node and (target_node << _WORD_ID_BITS | word_id) not in transitions:
+                target_node = fail[target_node]
+            target = transitions.get(target_node << _WORD_ID_BITS | word_id, 0)
+            fail[child] = target if target != child else 0
+            output_link[child] = target if outputs[target] else output_link[target]
+            queue.append(child)
+
+    # Children of each node sorted by word id, for a binary search per step
+    child_starts, child_words, child_nodes = array("I", [0]), array("I"), array("I")
+    output_starts, output_keys = array("I", [0]), []
+    for node in range(len(fail)):
+        for word_id, child in sorted(children.get(node, [])):
+            child_words.append(word_id)
+            child_nodes.append(child)
+        child_starts.append(len(child_words))
+        output_keys.extend(outputs[node] or ())
+        output_starts.append(len(output_keys))
+
+    # Vocabulary: open addressing, at most half full, slot value = word id + 1 (0 = empty)
+    size = 8
+    while size < 2 * len(word_ids):
+        size *= 2
+    word_slots = array("I", bytes(4 * size))
+    for word, word_id in word_ids.items():
+        slot = _word_slot(word) & (size - 1)
+        while word_slots[slot]:
+            slot = (slot + 1) & (size - 1)
+        word_slots[slot] = word_id + 1
+
+    return {
+        "word_slots": word_slots, "words": list(word_ids),
+        "child_starts": child_starts, "child_words": child_words, "child_nodes": child_nodes,
+        "fail": array("I", fail), "depth": array("I", depth), "output_link": array("I", output_link),
+        "output_starts": output_starts, "output_keys": output_keys,
+    }
+
+
+class SubstanceNameScanner:
+    """Multi-pattern matcher that finds every GADSL substance name in a text in one pass.
+
+    The automaton is held in flat tables of integers and strings (see TABLES), so the GADSL
+    snapshot can store it and every worker can scan with the mapped copy instead of its own.
+    """
+
+    TABLES = ("word_slots", "words", "child_starts", "child_words", "child_nodes",
+              "fail", "depth", "output_link", "output_starts", "output_keys")
+
+    def __init__(self, names):
+        """`names` maps each lookup key (the lowercased GADSL name) to the text to search for."""
+        self._set_tables(_build_tables(names))
+
+    @classmethod
+    def from_tables(cls, tables):
+        """A scanner over existing tables, e.g. the arrays of a GADSL snapshot."""
+        scanner = cls.__new__(cls)
+        scanner._set_tables(tables)
+        return scanner
+
+    def _set_tables(self, tables):
+        self._tables = tables
+        self._word_slots = tables["word_slots"]
+        self._words = tables["words"] # Word id -> word
+        self._child_starts = tables["child_starts"] # Node -> its first child in child_words / child_nodes
+        self._child_words = tables["child_words"]
+        self._child_nodes = tables["child_nodes"]
+        self._fail = tables["fail"]
+        self._depth = tables["depth"]
+        self._output_link = tables["output_link"] # Nearest node on the failure chain that has outputs
+        self._output_starts = tables["output_starts"] # Node -> its first lookup key in output_keys
+        self._output_keys = tables["output_keys"]
+
+    def tables(self):
+        """{name: table} of the automaton, for storing it (see TABLES)."""
+        return dict(self._tables)
+
+    def __len__(self):
+        """Number of automaton states, excluding the root."""
+        return len(self._fail) - 1
+
+    def scan(self, text):
+        """Returns every (start, end, key) hit in `text`; offsets are character positions in `text`."""
+        return self.scan_words((match.start(), match.end(), match.group().casefold())
+                               for match in _WORD_PATTERN.finditer(text))
+
+    def scan_words(self, words):
+        """Like scan(), over already tokenized (start, end, casefolded word) tuples (see msds_tokenizer.py)."""
+        hits = []
+        word_slots = self._word_slots
+        mask = len(word_slots) - 1
+        vocabulary = self._words
+        child_starts = self._child_starts
+        child_words = self._child_words
+        child_nodes = self._child_nodes
+        fail = self._fail
+        depth = self._depth
+        output_link = self._output_link
+        output_starts = self._output_starts
+        output_keys = self._output_keys
+        # Words and transitions already resolved in this text; texts repeat them a lot, and a
+        # dict hit is cheaper than probing and bisecting the (possibly memory-mapped) tables
+        known = {} # Word -> word id, or -1 if no name contains it
+        steps = {} # (node << _WORD_ID_BITS | word id) -> (next node, first node with hits), failure links included
+        starts = [] # Start offset of every word seen so far, to turn a match depth into an offset
+        node = 0
+
+        for start, end, word in words:
+            starts.append(start)
+            word_id = known.get(word)
+            if word_id is None:
+                word_id = -1
+                slot = _word_slot(word) & mask
+                while word_slots[slot]:
+                    if vocabulary[word_slots[slot] - 1] == word:
+                        word_id = word_slots[slot] - 1
+                        break
+                    slot = (slot + 1) & mask
+                known[word] = word_id
+            if word_id < 0:
+                node = 0 # No pattern contains this word, so every partial match ends here
+                continue
+            step = node << _WORD_ID_BITS | word_id
+            resolved = steps.get(step)
+            if resolved is None:
+                next_node = node
+                while True:
+                    high = child_starts[next_node + 1]
+                    position = bisect_left(child_words, word_id, child_starts[next_node], high)
+                    if position < high and child_words[position] == word_id:
+                        next_node = child_nodes[position]
+                        break
+                    if next_node == 0:
+                        break
+                    next_node = fail[next_node]
+                has_output = output_starts[next_node] < output_starts[next_node + 1]
+                resolved = steps[step] = (next_node, next_node if has_output else output_link[next_node])
+            node, hit_node = resolved
+
+            while hit_node:
+                hit_start = starts[len(starts) - depth[hit_node]]
+                for position in range(output_starts[hit_node], output_starts[hit_node + 1]):
+                    hits.append((hit_start, end, output_keys[position]))
+                hit_node = output_link[hit_node]
+        return hits
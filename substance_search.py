@@ -0,0 +1,187 @@
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from substance_scanner import normalize_substance_name, substance_name_variants
+
+# --- Typo-tolerant and prefix search over GADSL substance names ---
+# Names are normalized the same way as for the PDF scanner ("Lead(II) chromate" and
+# "lead-chromate" become "lead ii chromate" / "lead chromate"), then indexed two ways:
+#   * a sorted list of every name and every word-suffix of a name ("chromate", "ii chromate")
+#     for prefix / typeahead suggestions via binary search;
+#   * a trigram -> posting list index for ranked fuzzy matches (Dice similarity), so a query
+#     only touches the names that share trigrams with it instead of scanning all entries.
+# Both are sorted arrays searched by bisection, which work the same over Python lists and
+# over the arrays of a memory-mapped GADSL snapshot.
+
+
+def _trigrams(normalized):
+    """Distinct trigrams of each word, padded like pg_trgm ('  w', ' wo', 'wor', 'ord', 'rd ')."""
+    return {
+        padded[i:i + 3]
+        for padded in (f"  {word} " for word in normalized.split())
+        for i in range(len(padded) - 2)
+    }
+
+
+# Word-suffixes are indexed for the first few words only; later words of long systematic names
+# ("..., polymer with ...") are reachable through fuzzy search instead
+_MAX_SUFFIX_WORDS = 6
+
+
+def _build_tables(names):
+    """Index every name and synonym into the tables of SubstanceSearchIndex.TABLES."""
+    keys = [] # Document id -> lookup key
+    normalized_names = [] # Document id -> normalized name (or synonym)
+    trigram_counts = array("I") # Document id -> number of distinct trigrams
+    exact = {} # Normalized name -> lookup key
+    postings = defaultdict(lambda: array("I"))
+    prefixes = []
+
+    for key, name in names.items():
+        for variant in substance_name_variants(name):
+            normalized = normalize_substance_name(variant)
+            if not normalized or normalized in exact:
+                continue
+            doc_id = len(keys)
+            keys.append(key)
+            normalized_names.append(normalized)
+            exact[normalized] = key
+
+            trigrams = _trigrams(normalized)
+            trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                postings[trigram].append(doc_id)
+
+            # Every word-suffix, so "chromate" suggests "lead chromate" as well
+            words = normalized.split(" ")
+            for i in range(min(len(words), _MAX_SUFFIX_WORDS)):
+                prefixes.append((" ".join(words[i:]), i, doc_id))
+
+    exact_names = sorted(exact)
+    trigrams = sorted(postings)
+    posting_starts = array("I", [0])
+    posting_docs = array("I")
+    for trigram in trigrams:
+        posting_docs.extend(postings[trigram])
+        posting_starts.append(len(posting_docs))
+    prefixes.sort()
+    return {
+        "keys": keys, "normalized": normalized_names, "trigram_counts": trigram_counts,
+        "exact_names": exact_names, "exact_keys": [exact[name] for name in exact_names],
+        "trigrams": trigrams, "posting_starts": posting_starts, "posting_docs": posting_docs,
+        "prefix_texts": [text for text, _, _ in prefixes], "prefix_docs": array("I", (doc_id for _, _, doc_id in prefixes)),
+    }
+
+
+class SubstanceSearchIndex:
+    """Prefix and fuzzy search over substance names, returning their GADSL lookup keys.
+
+    Like the name scanner, the index is a set of flat, sorted tables (see TABLES) that the
+    GADSL snapshot stores, so workers search the shared mapped copy.
+    """
+
+    TABLES = ("keys", "normalized", "trigram_counts", "exact_names", "exact_keys",
+              "trigrams", "posting_starts", "posting_docs", "prefix_texts", "prefix_docs")
+
+    def __init__(self, names):
+        """`names` maps each lookup key (the lowercased GADSL name) to its display name."""
+        self._set_tables(_build_tables(names))
+
+    @classmethod
+    def from_tables(cls, tables):
+        """A search index over existing tables, e.g. the arrays of a GADSL snapshot."""
+        index = cls.__new__(cls)
+        index._set_tables(tables)
+        return index
+
+    def _set_tables(self, tables):
+        self._tables = tables
+        self._keys = tables["keys"] # Document id -> lookup key
+        self._normalized = tables["normalized"] # Document id -> normalized name (or synonym)
+        self._trigram_counts = tables["trigram_counts"] # Document id -> number of distinct trigrams
+        self._exact_names = tables["exact_names"] # Sorted normalized names, and the lookup key of each
+        self._exact_keys = tables["exact_keys"]
+        self._trigrams = tables["trigrams"] # Sorted trigrams, and the start of each one's posting list
+        self._posting_starts = tables["posting_starts"]
+        self._posting_docs = tables["posting_docs"]
+        self._prefix_texts = tables["prefix_texts"] # Sorted names and word-suffixes, and their document ids
+        self._prefix_docs = tables["prefix_docs"]
+
+    def tables(self):
+        """{name: table} of the index, for storing it (see TABLES)."""
+        return dict(self._tables)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _posting(self, trigram):
+        """Ids of the documents containing `trigram`, ascending (empty if none)."""
+        position = bisect_left(self._trigrams, trigram)
+        if position == len(self._trigrams) or self._trigrams[position] != trigram:
+            return ()
+        return self._posting_docs[self._posting_starts[position]:self._posting_starts[position + 1]]
+
+    def find_exact(self, name):
+        """Lookup key of a name equal to `name` after normalization, or None."""
+        normalized = normalize_substance_name(name)
+        position = bisect_left(self._exact_names, normalized)
+        if position < len(self._exact_names) and self._exact_names[position] == normalized:
+            return self._exact_keys[position]
+        return None
+
+    def suggest(self, prefix, limit=10):
+        """Lookup keys of names starting with `prefix` (or having a word that does), shortest first."""
+        prefix = normalize_substance_name(prefix)
+        if not prefix:
+            return []
+
+        start = bisect_left(self._prefix_texts, prefix)
+        seen = set()
+        candidates = []
+        # Collect a bounded number of matches, then rank: whole-name prefixes before word prefixes
+        for position in range(start, min(start + 50 * limit, len(self._prefix_texts))):
+            if not self._prefix_texts[position].startswith(prefix):
+                break
+            doc_id = self._prefix_docs[position]
+            key = self._keys[doc_id]
+            if key in seen:
+                continue
+            seen.add(key)
+            normalized = self._normalized[doc_id]
+            candidates.append((not normalized.startswith(prefix), len(normalized), key))
+        return [key for _, _, key in sorted(candidates)[:limit]]
+
+    def search(self, query, limit=10, time_budget_ms=25.0):
+        """Ranked (key, score) fuzzy matches for `query`, best first.
+
+        Posting lists are merged rarest trigram first; once `time_budget_ms` is spent the
+        remaining (most common, least selective) trigrams are skipped, so a query never
+        overruns its budget by more than one posting list.
+        """
+        normalized = normalize_substance_name(query)
+        query_trigrams = _trigrams(normalized)
+        if not query_trigrams:
+            return []
+
+        deadline = time.perf_counter() + time_budget_ms / 1000.0
+        postings = sorted(map(self._posting, query_trigrams), key=len)
+        shared = defaultdict(int)
+        for posting in postings:
+            for doc_id in posting:
+                shared[doc_id] += 1
+            if time.perf_counter() > deadline:
+                break
+
+        query_count = len(query_trigrams)
+        counts = self._trigram_counts
+        # Rank documents first and look up keys only for the best ones; ties keep posting order
+        ranked = sorted((-2.0 * common / (query_count + counts[doc_id]), position, doc_id)
+                        for position, (doc_id, common) in enumerate(shared.items()))
+        best = {}
+        for negative_score, _, doc_id in ranked:
+            best.setdefault(self._keys[doc_id], -negative_score) # A key's synonyms rank below its best match
+            if len(best) == limit:
+                break
+        return [(key, round(score, 4)) for key, score in best.items()]